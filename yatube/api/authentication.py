@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+def user_cache_key(user_id):
+    return f'jwt-user:{user_id}'
+
+
+def forget_user(user_id):
+    """
+    Убирает пользователя из кэша сразу и ещё раз после коммита, чтобы
+    запрос, прочитавший строку до коммита, не вернул её в кэш надолго.
+    """
+    key = user_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication, которая держит найденного по токену пользователя
+    в кэше JWT_USER_CACHE_TIMEOUT секунд: запросы с тем же токеном не
+    читают строку пользователя из базы. Запись сбрасывается сигналами
+    при сохранении (смена пароля, блокировка) и удалении пользователя.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # неактивный или удалённый пользователь не кэшируется:
+            # super() бросает AuthenticationFailed
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.JWT_USER_CACHE_TIMEOUT)
+        return user
@@ -1,6 +1,8 @@
 import django_filters as filters
+from rest_framework.filters import BaseFilterBackend
 
-from posts.models import Post
+from posts.models import Comment, Post
+from posts.search import prefix_match
 
 
 class PostFilter(filters.FilterSet):
@@ -10,7 +12,33 @@ class PostFilter(filters.FilterSet):
     group = filters.CharFilter(
         field_name='group__slug', lookup_expr='exact'
     )
+    since_id = filters.NumberFilter(field_name='id', lookup_expr='gt')
+    max_id = filters.NumberFilter(field_name='id', lookup_expr='lte')
 
     class Meta:
         model = Post
-        fields = ('author', 'group')
+        fields = ('author', 'group', 'since_id', 'max_id')
+
+
+class CommentFilter(filters.FilterSet):
+    since_id = filters.NumberFilter(field_name='id', lookup_expr='gt')
+    max_id = filters.NumberFilter(field_name='id', lookup_expr='lte')
+
+    class Meta:
+        model = Comment
+        fields = ('since_id', 'max_id')
+
+
+class UsernamePrefixFilter(BaseFilterBackend):
+    """
+    ?search= — начало имени пользователя в поле view.prefix_search_field.
+    В отличие от SearchFilter (icontains) ищется только начало имени и
+    с учётом регистра, зато по индексу username (см. prefix_match).
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        prefix = request.query_params.get(self.search_param, '').strip()
+        if not prefix:
+            return queryset
+        return queryset.filter(prefix_match(view.prefix_search_field, prefix))
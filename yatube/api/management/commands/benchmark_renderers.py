@@ -0,0 +1,67 @@
+import timeit
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import MessagePackParser, MessagePackRenderer
+from api.serializers import PostValuesSerializer
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает размер и время кодирования и разбора страницы '
+            'постов API в JSON и MessagePack')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int,
+            default=settings.REST_FRAMEWORK['PAGE_SIZE'],
+            help='Сколько постов на странице'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=1000,
+            help='Сколько раз кодировать страницу'
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        columns = PostValuesSerializer().columns()
+        rows = list(
+            Post.objects.order_by('-pub_date').values(*columns)
+            [:options['count']]
+        )
+        if not rows:
+            raise CommandError('Нет постов для замера')
+        self.stdout.write(
+            f'{len(rows)} постов, {repeat} повторов\n'
+            f'{"формат":<10}{"байт":>10}{"кодирование, мкс":>20}'
+            f'{"разбор, мкс":>15}'
+        )
+        formats = (
+            (JSONRenderer(), JSONParser()),
+            (MessagePackRenderer(), MessagePackParser()),
+        )
+        for renderer, parser in formats:
+            serializer = PostValuesSerializer()
+            serializer.native_datetimes = getattr(
+                renderer, 'native_datetimes', False
+            )
+            data = {
+                'next': None,
+                'previous': None,
+                'results': [serializer.to_representation(row) for row in rows],
+            }
+            content = renderer.render(data)
+            encode = timeit.timeit(lambda: renderer.render(data),
+                                   number=repeat)
+            decode = timeit.timeit(
+                lambda: parser.parse(BytesIO(content)), number=repeat
+            )
+            self.stdout.write(
+                f'{renderer.format:<10}{len(content):>10}'
+                f'{encode / repeat * 10 ** 6:>20.1f}'
+                f'{decode / repeat * 10 ** 6:>15.1f}'
+            )
@@ -1,6 +1,194 @@
-from rest_framework import viewsets, mixins
+import hashlib
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from posts.bulk import bulk_insert
+from posts.caching import http_last_modified, scopes_last_modified
 
 
 class ListCreateDestroyViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
-                               mixins.DestroyModelMixin, viewsets.GenericViewSet):
+                               mixins.DestroyModelMixin,
+                               viewsets.GenericViewSet):
     pass
+
+
+class DeltaListMixin:
+    """
+    Список с параметром since_id отдаёт только новые объекты, а если
+    новых нет — пустой ответ 304.
+    """
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        since_id = request.query_params.get('since_id')
+        if since_id and not response.data['results']:
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return response
+
+
+def split_param(value):
+    """'a, b,,c' -> ['a', 'b', 'c']; отсутствующий параметр -> None."""
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class ValuesListMixin:
+    """
+    Список и отдельный объект собираются из QuerySet.values() лёгким
+    сериализатором values_serializer_class: один запрос с нужными JOIN.
+    ?fields= сужает SELECT, ?expand= добавляет связанные данные.
+    """
+    values_serializer_class = None
+
+    def get_values_serializer(self):
+        params = self.request.query_params
+        return self.values_serializer_class(
+            context=self.get_serializer_context(),
+            fields=split_param(params.get('fields')),
+            expand=split_param(params.get('expand')) or (),
+        )
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        columns = serializer.columns()
+        # поля курсора нужны пагинатору, даже если их не просили
+        keys = getattr(self.paginator, 'keys', ())
+        columns += [key for key in keys if key not in columns]
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.paginate_queryset(queryset.values(*columns))
+        data = [serializer.to_representation(row) for row in rows]
+        return self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            queryset.values(*serializer.columns()),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return Response(serializer.to_representation(row))
+
+
+class ConditionalMixin:
+    """
+    Условные GET-запросы к list и retrieve. ETag и Last-Modified считаются
+    по отметкам изменения областей кэша (см. posts.caching.scope_stamp),
+    поэтому ответ 304 отдаётся без запросов к базе и без сериализации.
+    list_scopes и detail_scopes — шаблоны областей, в которые
+    подставляются аргументы URL, например 'post:{pk}'.
+    """
+    list_scopes = ()
+    detail_scopes = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_scopes, super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.detail_scopes, super().retrieve, request, *args, **kwargs
+        )
+
+    def conditional_response(self, scopes, handler, request, *args,
+                             **kwargs):
+        if not scopes:
+            return handler(request, *args, **kwargs)
+        names = [scope.format(**self.kwargs) for scope in scopes]
+        last_modified = scopes_last_modified(names)
+        digest = hashlib.md5('|'.join((
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            str(last_modified),
+        )).encode()).hexdigest()
+        etag = quote_etag(digest)
+        header_last_modified = http_last_modified(last_modified)
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=header_last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if header_last_modified is not None:
+                response['Last-Modified'] = http_date(header_last_modified)
+            patch_cache_control(
+                response, public=True, max_age=settings.API_CACHE_MAX_AGE
+            )
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
+class BulkCreateMixin:
+    """
+    POST <list>/_bulk/ принимает список объектов (не больше API_BULK_LIMIT),
+    проверяет каждый и сохраняет все корректные одной вставкой в одной
+    транзакции. В ответе для каждого элемента свой статус: 201 и данные
+    или 400 и ошибки; сам ответ — 201, если созданы все, иначе 207.
+    """
+    bulk_serializer_class = None
+
+    @action(detail=False, methods=['post'], url_path='_bulk')
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': [
+                'Ожидается список объектов.'
+            ]})
+        if len(items) > settings.API_BULK_LIMIT:
+            raise ValidationError({'non_field_errors': [
+                f'Не больше {settings.API_BULK_LIMIT} объектов за запрос.'
+            ]})
+        serializer_class = (self.bulk_serializer_class
+                            or self.get_serializer_class())
+        context = self.get_serializer_context()
+        serializers = [
+            serializer_class(data=item, context=context) for item in items
+        ]
+        for serializer in serializers:
+            serializer.is_valid()
+        created = iter(self.perform_bulk_create(
+            [serializer for serializer in serializers if not serializer.errors]
+        ))
+        results = [
+            {'status': status.HTTP_400_BAD_REQUEST,
+             'errors': serializer.errors}
+            if serializer.errors else next(created)
+            for serializer in serializers
+        ]
+        all_created = all(
+            result['status'] == status.HTTP_201_CREATED for result in results
+        )
+        return Response(
+            {'results': results},
+            status=(status.HTTP_201_CREATED if all_created
+                    else status.HTTP_207_MULTI_STATUS)
+        )
+
+    def get_bulk_save_kwargs(self):
+        """Поля, которые perform_create передаёт в save()."""
+        return {}
+
+    def perform_bulk_create(self, serializers):
+        """Сохраняет проверенные объекты; результат — по одному на каждый."""
+        model = self.get_serializer_class().Meta.model
+        extra = self.get_bulk_save_kwargs()
+        objects = bulk_insert(model, [
+            model(**serializer.validated_data, **extra)
+            for serializer in serializers
+        ])
+        return [
+            {'status': status.HTTP_201_CREATED,
+             'data': serializer.to_representation(obj)}
+            for serializer, obj in zip(serializers, objects)
+        ]
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from posts.pagination import CursorPaginator
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация по ключу (keys) без COUNT и OFFSET: ссылки next и
+    previous содержат непрозрачные токены before/after.
+    """
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    keys = ('pub_date', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = CursorPaginator(queryset, self.page_size, self.keys)
+        self.page = paginator.get_page(
+            before=request.query_params.get('before'),
+            after=request.query_params.get('after'),
+        )
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        return self._link('before', 'after', self.page.next_cursor())
+
+    def get_previous_link(self):
+        return self._link('after', 'before', self.page.previous_cursor())
+
+    def _link(self, param, other_param, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(),
+                                 other_param)
+        return replace_query_param(url, param, cursor)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class CommentKeysetPagination(KeysetPagination):
+    keys = ('created', 'id')
+
+
+class FollowKeysetPagination(KeysetPagination):
+    keys = ('id',)
@@ -0,0 +1,51 @@
+import datetime
+import decimal
+import uuid
+
+import msgpack
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+
+def _default(obj):
+    """Типы, которых нет в MessagePack, передаются так же, как в JSON."""
+    if isinstance(obj, (decimal.Decimal, uuid.UUID, Promise)):
+        return force_str(obj)
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Cannot serialize {type(obj).__name__} to MessagePack')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Компактный двоичный формат. Даты и время передаются собственным типом
+    MessagePack (timestamp), а не строкой: сериализаторы смотрят на
+    native_datetimes выбранного рендерера.
+    """
+    media_type = MSGPACK_MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    native_datetimes = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, datetime=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), timestamp=3)
+        except ValueError as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
@@ -1,23 +1,61 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import models
 from rest_framework import serializers
 
+from posts.forms import ImageUploadField
 from posts.models import Comment, Post, Group, Follow
 
 User = get_user_model()
 
+SELF_FOLLOW_ERROR = 'Ошибка: невозможно подписаться на самого себя'
 
-class PostSerializer(serializers.ModelSerializer):
+
+def native_datetimes(context):
+    """Выбранный рендерер умеет передавать время своим типом."""
+    renderer = getattr(context.get('request'), 'accepted_renderer', None)
+    return getattr(renderer, 'native_datetimes', False)
+
+
+class NativeDateTimeField(serializers.DateTimeField):
+    """Строка ISO 8601, а для двоичных форматов — сам datetime."""
+
+    def to_representation(self, value):
+        if value and native_datetimes(self.context):
+            return self.enforce_timezone(value)
+        return super().to_representation(value)
+
+
+class ModelSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.DateTimeField: NativeDateTimeField,
+    }
+
+
+class PostSerializer(ModelSerializer):
     author = serializers.SlugRelatedField(
         slug_field='username',
         read_only=True
     )
 
     class Meta:
-        fields = '__all__'
+        exclude = ('comment_count',)
         model = Post
+        extra_kwargs = {'image': {'_DjangoImageField': ImageUploadField}}
+
+
+class PostBulkSerializer(PostSerializer):
+    """
+    Элемент массового создания постов. Сообщества ищутся сразу для всего
+    списка в PostViewSet.perform_bulk_create, а не запросом на элемент.
+    """
+    group = serializers.IntegerField(
+        source='group_id', required=False, allow_null=True
+    )
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(ModelSerializer):
     author = serializers.SlugRelatedField(
         read_only=True,
         slug_field='username'
@@ -53,12 +91,203 @@ class FollowSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         author = data['author']
         if user == author:
-            raise serializers.ValidationError({
-                'author': 'Ошибка: невозможно подписаться на самого себя'
-            })
+            raise serializers.ValidationError({'author': SELF_FOLLOW_ERROR})
         if Follow.objects.filter(user_id=user.id,
                                  author_id=author.id).exists():
             raise serializers.ValidationError({
                 'author': 'Ошибка: вы уже подписаны на этого пользователя'
             })
         return data
+
+
+class FollowBulkSerializer(serializers.Serializer):
+    """
+    Элемент массовой подписки. Авторы ищутся и проверяются сразу для всего
+    списка в FollowViewSet.perform_bulk_create, а не запросом на элемент.
+    """
+    author = serializers.CharField(max_length=150)
+
+
+class FollowUpdateSerializer(serializers.Serializer):
+    follow = serializers.ListField(
+        child=serializers.CharField(max_length=150), default=list
+    )
+    unfollow = serializers.ListField(
+        child=serializers.CharField(max_length=150), default=list
+    )
+
+    def validate(self, data):
+        if len(data['follow']) + len(data['unfollow']) > (
+                settings.API_BULK_LIMIT):
+            raise serializers.ValidationError(
+                f'Не больше {settings.API_BULK_LIMIT} авторов за запрос.'
+            )
+        if set(data['follow']) & set(data['unfollow']):
+            raise serializers.ValidationError(
+                'Нельзя одновременно подписаться и отписаться.'
+            )
+        return data
+
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(
+        choices=('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'),
+        default='GET'
+    )
+    path = serializers.RegexField(r'^/api/')
+    body = serializers.JSONField(required=False, default=None)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.API_BATCH_LIMIT:
+            raise serializers.ValidationError(
+                f'Не больше {settings.API_BATCH_LIMIT} подзапросов в пакете.'
+            )
+        return value
+
+
+AUTHOR_EXPANSION = {
+    'id': 'author_id',
+    'username': 'author__username',
+    'first_name': 'author__first_name',
+    'last_name': 'author__last_name',
+}
+
+
+class ValuesSerializer:
+    """
+    Сериализатор только для чтения: строит словари из строк
+    QuerySet.values(), не создавая моделей и полей DRF на каждую запись.
+    Без параметров вывод совпадает с соответствующим ModelSerializer.
+    fields — имя в ответе и колонка values(); expansions — поля, которые
+    по запросу ?expand= заменяются вложенным объектом (словарь колонок)
+    или добавляются в ответ. Параметр ?fields= оставляет в ответе и
+    в SELECT только перечисленные поля.
+    """
+    model = None
+    fields = {}
+    expansions = {}
+    datetime_fields = ()
+    image_fields = ()
+
+    def __init__(self, context=None, fields=None, expand=()):
+        self.context = context or {}
+        self.datetime_field = serializers.DateTimeField()
+        self.native_datetimes = native_datetimes(self.context)
+        errors = {}
+        for param, names, known in (('fields', fields or (), self.fields),
+                                    ('expand', expand, self.expansions)):
+            unknown = sorted(set(names) - set(known))
+            if unknown:
+                errors[param] = f'Неизвестные поля: {", ".join(unknown)}'
+        if errors:
+            raise serializers.ValidationError(errors)
+        names = [
+            name for name in self.fields if fields is None or name in fields
+        ]
+        names += [name for name in expand if name not in names]
+        self.selected = {
+            name: (self.expansions if name in expand else self.fields)[name]
+            for name in names
+        }
+
+    def columns(self):
+        columns = []
+        for spec in self.selected.values():
+            for column in spec.values() if isinstance(spec, dict) else [spec]:
+                if column not in columns:
+                    columns.append(column)
+        return columns
+
+    def to_representation(self, row):
+        data = {}
+        for name, spec in self.selected.items():
+            if isinstance(spec, dict):
+                nested = {key: row[column] for key, column in spec.items()}
+                # LEFT JOIN на пустой внешний ключ даёт строку из None
+                empty = all(value is None for value in nested.values())
+                data[name] = None if empty else nested
+                continue
+            value = row[spec]
+            if name in self.datetime_fields:
+                value = self.to_datetime(value)
+            elif name in self.image_fields:
+                value = self.image_url(spec, value)
+            data[name] = value
+        return data
+
+    def to_datetime(self, value):
+        if value and self.native_datetimes:
+            return self.datetime_field.enforce_timezone(value)
+        return self.datetime_field.to_representation(value)
+
+    def image_url(self, column, name):
+        if not name:
+            return None
+        storage = self.model._meta.get_field(column).storage
+        url = storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class PostValuesSerializer(ValuesSerializer):
+    model = Post
+    fields = {
+        'id': 'id',
+        'author': 'author__username',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+        'group': 'group_id',
+    }
+    expansions = {
+        'author': AUTHOR_EXPANSION,
+        'group': {
+            'id': 'group__id',
+            'title': 'group__title',
+            'slug': 'group__slug',
+            'description': 'group__description',
+        },
+        'comments_count': 'comment_count',
+    }
+    datetime_fields = ('pub_date',)
+    image_fields = ('image',)
+
+
+class CommentValuesSerializer(ValuesSerializer):
+    model = Comment
+    fields = {
+        'id': 'id',
+        'author': 'author__username',
+        'post': 'post_id',
+        'text': 'text',
+        'created': 'created',
+    }
+    expansions = {
+        'author': AUTHOR_EXPANSION,
+    }
+    datetime_fields = ('created',)
+
+
+class FollowerValuesSerializer(ValuesSerializer):
+    model = Follow
+    fields = {
+        'username': 'user__username',
+        'first_name': 'user__first_name',
+        'last_name': 'user__last_name',
+    }
+
+
+class FollowingValuesSerializer(ValuesSerializer):
+    model = Follow
+    fields = {
+        'username': 'author__username',
+        'first_name': 'author__first_name',
+        'last_name': 'author__last_name',
+    }
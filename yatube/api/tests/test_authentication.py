@@ -0,0 +1,58 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import user_cache_key
+
+User = get_user_model()
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test_user',
+                                             password='password')
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}'
+        )
+
+    def test_user_read_from_cache(self):
+        """Проверяет, что повторный запрос с токеном не читает
+        пользователя из базы."""
+        # пользователь и подсчёт подписок
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/follow/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        # только подсчёт подписок
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/follow/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_user_changes_reset_cache(self):
+        """Проверяет, что смена пароля, блокировка и удаление сбрасывают
+        кэш."""
+        key = user_cache_key(self.user.id)
+        self.client.get('/api/v1/follow/')
+        self.assertIsNotNone(cache.get(key))
+        self.user.set_password('new password')
+        self.user.save()
+        self.assertIsNone(cache.get(key))
+
+        self.client.get('/api/v1/follow/')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/v1/follow/')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertIsNone(cache.get(key))
+
+        self.user.is_active = True
+        self.user.save()
+        self.client.get('/api/v1/follow/')
+        self.user.delete()
+        response = self.client.get('/api/v1/follow/')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
@@ -0,0 +1,123 @@
+import datetime
+from http import HTTPStatus
+from io import BytesIO, StringIO
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.renderers import (MSGPACK_MEDIA_TYPE, MessagePackParser,
+                           MessagePackRenderer)
+from api.serializers import (CommentSerializer, CommentValuesSerializer,
+                             FollowSerializer, GroupSerializer,
+                             PostSerializer, PostValuesSerializer)
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class MessagePackTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group,
+            image='posts/picture.jpg'
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Коммент'
+        )
+        cls.follow = Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def msgpack_context(self):
+        request = Request(APIRequestFactory().get('/api/v1/posts/'))
+        request.accepted_renderer = MessagePackRenderer()
+        return {'request': request}
+
+    def test_serializers_round_trip(self):
+        """Проверяет, что данные каждого сериализатора переживают
+        кодирование и разбор без изменений."""
+        context = self.msgpack_context()
+        post_row = Post.objects.filter(pk=self.post.pk).values(
+            *PostValuesSerializer.fields.values()
+        ).get()
+        comment_row = Comment.objects.filter(pk=self.comment.pk).values(
+            *CommentValuesSerializer.fields.values()
+        ).get()
+        cases = {
+            'post': PostSerializer(self.post, context=context).data,
+            'comment': CommentSerializer(self.comment, context=context).data,
+            'group': GroupSerializer(self.group, context=context).data,
+            'follow': FollowSerializer(self.follow, context=context).data,
+            'post values': PostValuesSerializer(context).to_representation(
+                post_row
+            ),
+            'comment values': CommentValuesSerializer(
+                context
+            ).to_representation(comment_row),
+        }
+        renderer, parser = MessagePackRenderer(), MessagePackParser()
+        for name, data in cases.items():
+            with self.subTest(serializer=name):
+                content = renderer.render(data)
+                self.assertEqual(parser.parse(BytesIO(content)), data)
+        self.assertIsInstance(cases['post']['pub_date'], datetime.datetime)
+        self.assertEqual(cases['post values']['pub_date'],
+                         self.post.pub_date)
+
+    def test_negotiation(self):
+        """Проверяет, что API отдаёт MessagePack по заголовку Accept
+        с временем собственным типом."""
+        addresses = (
+            '/api/v1/posts/',
+            f'/api/v1/posts/{self.post.id}/',
+            f'/api/v1/posts/{self.post.id}/comments/',
+            '/api/v1/groups/',
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address,
+                                           HTTP_ACCEPT=MSGPACK_MEDIA_TYPE)
+                self.assertEqual(response['Content-Type'],
+                                 MSGPACK_MEDIA_TYPE)
+                self.assertIsInstance(
+                    msgpack.unpackb(response.content, timestamp=3), dict
+                )
+        response = self.client.get(f'/api/v1/posts/{self.post.id}/',
+                                   HTTP_ACCEPT=MSGPACK_MEDIA_TYPE)
+        data = msgpack.unpackb(response.content, timestamp=3)
+        self.assertEqual(data['pub_date'], self.post.pub_date)
+        json_etag = self.client.get(f'/api/v1/posts/{self.post.id}/')['ETag']
+        self.assertNotEqual(response['ETag'], json_etag)
+
+    def test_msgpack_request_body(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            '/api/v1/posts/',
+            msgpack.packb({'text': 'Из MessagePack'}),
+            content_type=MSGPACK_MEDIA_TYPE,
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertTrue(Post.objects.filter(text='Из MessagePack').exists())
+        response = self.client.post(
+            '/api/v1/posts/', b'\xc1', content_type=MSGPACK_MEDIA_TYPE
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_renderers', repeat=2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[2].startswith('json'))
+        self.assertTrue(lines[3].startswith('msgpack'))
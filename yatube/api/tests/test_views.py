@@ -0,0 +1,671 @@
+import math
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.serializers import (CommentSerializer, CommentValuesSerializer,
+                             PostSerializer, PostValuesSerializer)
+from posts.caching import SITE_SCOPE, scopes_last_modified
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# часы, по которым ставятся отметки областей и считается Last-Modified
+CLOCK = 'posts.caching.time.time'
+
+
+class PostApiPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {number}', author=cls.user)
+            for number in range(13)
+        ]
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.user, text=f'Коммент {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_posts_cursor_pagination(self):
+        """Проверяет, что список постов листается курсорами без count."""
+        response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNone(response.data['previous'])
+        second = self.client.get(response.data['next'])
+        self.assertEqual(len(second.data['results']), 3)
+        self.assertIsNone(second.data['next'])
+        ids = [post['id'] for post in response.data['results']]
+        ids += [post['id'] for post in second.data['results']]
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], response.data['results'])
+
+    def test_posts_since_id_returns_delta(self):
+        """Проверяет, что since_id отдаёт только новые посты, а при их
+        отсутствии ответ 304."""
+        last_id = self.posts[-1].id
+        response = self.client.get('/api/v1/posts/', {'since_id': last_id})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        new_post = Post.objects.create(text='Новый', author=self.user)
+        response = self.client.get('/api/v1/posts/', {'since_id': last_id})
+        self.assertEqual(
+            [post['id'] for post in response.data['results']], [new_post.id]
+        )
+        response = self.client.get(
+            '/api/v1/posts/', {'max_id': self.posts[1].id}
+        )
+        self.assertEqual(
+            [post['id'] for post in response.data['results']],
+            [self.posts[1].id, self.posts[0].id]
+        )
+
+    def test_comments_since_id(self):
+        comments = list(self.posts[0].comments.order_by('id'))
+        url = f'/api/v1/posts/{self.posts[0].id}/comments/'
+        response = self.client.get(url, {'since_id': comments[0].id})
+        self.assertEqual(
+            [comment['id'] for comment in response.data['results']],
+            [comments[2].id, comments[1].id]
+        )
+        response = self.client.get(url, {'since_id': comments[2].id})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+
+class ApiQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.other_user = User.objects.create_user(username='other_user')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой', author=cls.user, group=cls.group,
+            image='posts/picture.jpg'
+        )
+        for number in range(12):
+            author = cls.user if number % 2 else cls.other_user
+            Post.objects.create(text=f'Пост {number}', author=author)
+            Comment.objects.create(post=cls.post, author=author, text='Ок')
+        Follow.objects.create(user=cls.user, author=cls.other_user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_list_endpoints_use_constant_queries(self):
+        """Проверяет, что страница списка — один запрос к базе при любом
+        числе авторов на странице."""
+        addresses = (
+            '/api/v1/posts/',
+            f'/api/v1/posts/{self.post.id}/comments/',
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                with self.assertNumQueries(1):
+                    response = self.client.get(address)
+                self.assertEqual(len(response.data['results']), 10)
+                with self.assertNumQueries(1):
+                    self.client.get(response.data['next'])
+
+    def test_follow_list_uses_constant_queries(self):
+        """Проверяет, что подписки отдаются одним запросом с обоими
+        пользователями."""
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/follow/')
+        self.assertEqual(
+            response.data['results'],
+            [{'user': 'test_user', 'author': 'other_user'}]
+        )
+
+    def test_values_serializer_matches_model_serializer(self):
+        """Проверяет, что лёгкий сериализатор отдаёт то же, что и
+        модельный."""
+        request = APIRequestFactory().get('/api/v1/posts/')
+        context = {'request': request}
+        post = Post.objects.select_related('author').get(pk=self.post.pk)
+        row = Post.objects.filter(pk=post.pk).values(
+            *PostValuesSerializer.fields.values()
+        ).get()
+        self.assertEqual(
+            PostValuesSerializer(context).to_representation(row),
+            PostSerializer(post, context=context).data
+        )
+        comment = self.post.comments.select_related('author').first()
+        row = Comment.objects.filter(pk=comment.pk).values(
+            *CommentValuesSerializer.fields.values()
+        ).get()
+        self.assertEqual(
+            CommentValuesSerializer(context).to_representation(row),
+            CommentSerializer(comment, context=context).data
+        )
+
+    def test_missing_post_comments_not_found(self):
+        response = self.client.get('/api/v1/posts/0/comments/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_create_comment_without_reading_post(self):
+        """Проверяет, что комментарий создаётся без отдельного чтения
+        поста, а к несуществующему посту — не создаётся и даёт 404."""
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/api/v1/posts/{self.post.id}/comments/', {'text': 'Новый'}
+            )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        sql = [query['sql'] for query in queries]
+        insert = next(number for number, query in enumerate(sql)
+                      if query.startswith('INSERT'))
+        self.assertFalse(any('"posts_post"' in query
+                             for query in sql[:insert]))
+
+        comments = Comment.objects.count()
+        for address, data in (
+            ('/api/v1/posts/0/comments/', {'text': 'Мимо'}),
+            ('/api/v1/posts/0/comments/_bulk/', [{'text': 'Мимо'}]),
+        ):
+            with self.subTest(address=address):
+                response = self.client.post(address, data, format='json')
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(Comment.objects.count(), comments)
+
+    def test_fields_trim_select(self):
+        """Проверяет, что ?fields= убирает лишние колонки из SELECT."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/posts/?fields=id,pub_date')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        for item in response.data['results']:
+            self.assertEqual(set(item), {'id', 'pub_date'})
+        sql = queries.captured_queries[0]['sql']
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('"image"', sql)
+        self.assertIsNotNone(response.data['next'])
+        next_page = self.client.get(response.data['next'])
+        self.assertEqual(len(next_page.data['results']), 3)
+
+    def test_expand_related_in_one_query(self):
+        """Проверяет, что ?expand= встраивает связанные данные без
+        дополнительных запросов."""
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f'/api/v1/posts/{self.post.id}/'
+                '?expand=author,group,comments_count'
+            )
+        self.assertEqual(response.data['author'], {
+            'id': self.user.id,
+            'username': 'test_user',
+            'first_name': '',
+            'last_name': '',
+        })
+        self.assertEqual(response.data['group']['slug'], 'group')
+        self.assertEqual(response.data['comments_count'], 12)
+        response = self.client.get(
+            '/api/v1/posts/?fields=id,group&expand=group'
+        )
+        groups = [item['group'] for item in response.data['results']]
+        self.assertIsNone(groups[0])
+        response = self.client.get(
+            f'/api/v1/posts/{self.post.id}/comments/?expand=author'
+        )
+        self.assertIn('username', response.data['results'][0]['author'])
+
+    def test_unknown_fields_rejected(self):
+        addresses = (
+            '/api/v1/posts/?fields=id,password',
+            '/api/v1/posts/?expand=post',
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.BAD_REQUEST)
+
+
+class ApiConditionalTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_not_modified_without_queries(self):
+        """Проверяет, что повторный запрос с ETag получает 304 без
+        обращения к базе."""
+        addresses = (
+            '/api/v1/groups/',
+            f'/api/v1/groups/{self.group.id}/',
+            '/api/v1/posts/',
+            f'/api/v1/posts/{self.post.id}/',
+            f'/api/v1/posts/{self.post.id}/comments/',
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('Accept', response['Vary'])
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        address, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_changes_invalidate_etag(self):
+        """Проверяет, что изменения данных меняют ETag."""
+        changes = (
+            ('/api/v1/groups/',
+             lambda: Group.objects.create(title='Новая', slug='new')),
+            (f'/api/v1/posts/{self.post.id}/',
+             lambda: Post.objects.filter(pk=self.post.pk).first().save()),
+            (f'/api/v1/posts/{self.post.id}/comments/',
+             lambda: Comment.objects.create(
+                 post=self.post, author=self.user, text='Коммент'
+             )),
+        )
+        for address, change in changes:
+            with self.subTest(address=address):
+                etag = self.client.get(address)['ETag']
+                change()
+                response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since_sees_same_second_change(self):
+        """Проверяет, что Last-Modified появляется после секунды отметки
+        и изменение после ответа не даёт 304 по If-Modified-Since."""
+        address = f'/api/v1/posts/{self.post.id}/'
+        self.client.get(address)
+        stamp = scopes_last_modified([SITE_SCOPE, f'post:{self.post.id}'])
+        with mock.patch(CLOCK, return_value=stamp):
+            response = self.client.get(address)
+        self.assertFalse(response.has_header('Last-Modified'))
+        with mock.patch(CLOCK, return_value=math.ceil(stamp) + 1):
+            last_modified = self.client.get(address)['Last-Modified']
+            response = self.client.get(
+                address, HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+            self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+            Post.objects.filter(pk=self.post.pk).first().save()
+            response = self.client.get(
+                address, HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_posts_do_not_invalidate_groups(self):
+        etag = self.client.get('/api/v1/groups/')['ETag']
+        Post.objects.create(text='Ещё пост', author=self.user)
+        response = self.client.get('/api/v1/groups/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+
+@override_settings(API_BULK_LIMIT=5)
+class ApiBulkCreateTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.author = User.objects.create_user(username='author')
+        cls.followed = User.objects.create_user(username='followed')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        Follow.objects.create(user=cls.user, author=cls.followed)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_posts(self):
+        """Проверяет создание постов списком с отдельным статусом для
+        каждого элемента."""
+        response = self.client.post('/api/v1/posts/_bulk/', [
+            {'text': 'Первый', 'group': self.group.id},
+            {'text': ''},
+            {'text': 'Второй'},
+        ], format='json')
+        self.assertEqual(response.status_code, HTTPStatus.MULTI_STATUS)
+        statuses = [item['status'] for item in response.data['results']]
+        self.assertEqual(statuses, [201, 400, 201])
+        self.assertIn('text', response.data['results'][1]['errors'])
+        created = response.data['results'][0]['data']
+        self.assertEqual(created['author'], 'test_user')
+        self.assertEqual(created['group'], self.group.id)
+        self.assertTrue(Post.objects.filter(
+            pk=created['id'], author=self.user, group=self.group
+        ).exists())
+        self.assertEqual(self.user.stats.posts, 2)
+
+    def test_bulk_posts_look_up_groups_once(self):
+        """Проверяет, что сообщества всех элементов ищутся одним запросом,
+        а неизвестное сообщество отклоняет только свой элемент."""
+        items = [{'text': f'Пост {number}', 'group': self.group.id}
+                 for number in range(4)]
+        items.append({'text': 'Мимо', 'group': self.group.id + 100})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/posts/_bulk/', items,
+                                        format='json')
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            [201, 201, 201, 201, 400]
+        )
+        self.assertIn('group', response.data['results'][4]['errors'])
+        first_insert = next(
+            number for number, query in enumerate(queries.captured_queries)
+            if query['sql'].startswith('INSERT')
+        )
+        group_lookups = [
+            query for query in queries.captured_queries[:first_insert]
+            if 'FROM "posts_group"' in query['sql']
+        ]
+        self.assertEqual(len(group_lookups), 1)
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 4)
+
+    def test_bulk_comments(self):
+        response = self.client.post(
+            f'/api/v1/posts/{self.post.id}/comments/_bulk/',
+            [{'text': 'Раз'}, {'text': 'Два'}], format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        self.assertEqual(
+            [item['data']['post'] for item in response.data['results']],
+            [self.post.id, self.post.id]
+        )
+
+    def test_bulk_follows(self):
+        """Проверяет, что повторы, подписка на себя и неизвестные авторы
+        не мешают создать остальные подписки."""
+        response = self.client.post('/api/v1/follow/_bulk/', [
+            {'author': 'author'},
+            {'author': 'followed'},
+            {'author': 'author'},
+            {'author': 'test_user'},
+            {'author': 'nobody'},
+        ], format='json')
+        self.assertEqual(response.status_code, HTTPStatus.MULTI_STATUS)
+        statuses = [item['status'] for item in response.data['results']]
+        self.assertEqual(statuses, [201, 200, 200, 400, 400])
+        self.assertEqual(
+            set(self.user.follower.values_list('author__username',
+                                               flat=True)),
+            {'author', 'followed'}
+        )
+        self.assertEqual(self.author.stats.followers, 1)
+
+    def test_bulk_limits(self):
+        cases = (
+            ('/api/v1/posts/_bulk/', [{'text': 'Пост'}] * 6),
+            ('/api/v1/posts/_bulk/', {'text': 'Пост'}),
+        )
+        for address, data in cases:
+            with self.subTest(data=data):
+                response = self.client.post(address, data, format='json')
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.BAD_REQUEST)
+        self.client.force_authenticate(None)
+        response = self.client.post('/api/v1/posts/_bulk/',
+                                    [{'text': 'Пост'}], format='json')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+
+class ApiBatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group
+        )
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ок')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, requests, **kwargs):
+        return self.client.post(
+            '/api/v1/batch/', {'requests': requests, **kwargs}, format='json'
+        )
+
+    def test_post_screen_in_one_request(self):
+        """Проверяет, что пакет возвращает ответы подзапросов по порядку
+        и с пользователем пакета."""
+        response = self.batch([
+            {'path': f'/api/v1/posts/{self.post.id}/'},
+            {'path': f'/api/v1/posts/{self.post.id}/comments/'},
+            {'path': f'/api/v1/groups/{self.group.id}/'},
+            {'path': '/api/v1/follow/?search=author'},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        responses = response.data['responses']
+        self.assertEqual([item['status'] for item in responses],
+                         [200, 200, 200, 200])
+        self.assertEqual(responses[0]['body']['text'], 'Пост')
+        self.assertIn('ETag', responses[0]['headers'])
+        self.assertEqual(len(responses[1]['body']['results']), 1)
+        self.assertEqual(responses[2]['body']['slug'], 'group')
+        self.assertEqual(responses[3]['body']['results'][0]['author'],
+                         'author')
+
+    def test_writes_run_in_order(self):
+        response = self.batch([
+            {'method': 'POST', 'path': f'/api/v1/posts/{self.post.id}/'
+             'comments/', 'body': {'text': 'Новый'}},
+            {'path': f'/api/v1/posts/{self.post.id}/comments/'},
+            {'method': 'DELETE', 'path': f'/api/v1/posts/{self.post.id}/'},
+        ], parallel=True)
+        responses = response.data['responses']
+        self.assertEqual([item['status'] for item in responses],
+                         [201, 200, 403])
+        self.assertEqual(len(responses[1]['body']['results']), 2)
+
+    def test_anonymous_batch(self):
+        self.client.force_authenticate(None)
+        response = self.batch([
+            {'path': '/api/v1/posts/'},
+            {'path': '/api/v1/follow/'},
+        ])
+        self.assertEqual([item['status'] for item in
+                          response.data['responses']], [200, 401])
+
+    @override_settings(API_BATCH_LIMIT=2)
+    def test_invalid_batches(self):
+        cases = (
+            [{'path': '/api/v1/posts/'}] * 3,
+            [{'path': '/admin/'}],
+            [{'method': 'TRACE', 'path': '/api/v1/posts/'}],
+            [],
+        )
+        for requests in cases:
+            with self.subTest(requests=requests):
+                response = self.batch(requests)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.BAD_REQUEST)
+        response = self.batch([{'path': '/api/v1/batch/'},
+                               {'path': '/api/v1/unknown/'}])
+        self.assertEqual([item['status'] for item in
+                          response.data['responses']], [404, 404])
+
+
+class ApiParallelBatchTests(TransactionTestCase):
+    def test_parallel_reads(self):
+        """Проверяет, что параллельный пакет отдаёт то же, что
+        последовательный."""
+        user = User.objects.create_user(username='test_user')
+        posts = [
+            Post.objects.create(text=f'Пост {number}', author=user)
+            for number in range(4)
+        ]
+        client = APIClient()
+        requests = [{'path': f'/api/v1/posts/{post.id}/'} for post in posts]
+        responses = {}
+        for parallel in (False, True):
+            response = client.post('/api/v1/batch/', {
+                'requests': requests, 'parallel': parallel
+            }, format='json')
+            responses[parallel] = [
+                (item['status'], item['body'])
+                for item in response.data['responses']
+            ]
+        self.assertEqual(responses[True], responses[False])
+        self.assertEqual([body['text'] for _, body in responses[True]],
+                         [post.text for post in posts])
+
+
+class ApiFollowListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{number:02}')
+            for number in range(12)
+        ]
+        cls.other = User.objects.create_user(username='other')
+        for reader in cls.readers + [cls.other]:
+            Follow.objects.create(user=reader, author=cls.author)
+        Follow.objects.create(user=cls.author, author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_followers_by_cursor(self):
+        """Проверяет, что подписчики идут от новых к старым страницами
+        по курсору."""
+        response = self.client.get('/api/v1/users/author/followers/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        first = [item['username'] for item in response.data['results']]
+        self.assertEqual(first[0], 'other')
+        self.assertEqual(len(first), 10)
+        response = self.client.get(response.data['next'])
+        second = [item['username'] for item in response.data['results']]
+        self.assertEqual(second, ['reader02', 'reader01', 'reader00'])
+        self.assertIsNone(response.data['next'])
+
+    def test_following(self):
+        response = self.client.get('/api/v1/users/author/following/')
+        self.assertEqual(response.data['results'], [
+            {'username': 'other', 'first_name': '', 'last_name': ''}
+        ])
+        response = self.client.get('/api/v1/users/nobody/following/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_prefix_search_is_anchored(self):
+        """Проверяет, что поиск по началу имени — LIKE 'prefix%', который
+        может идти по индексу, а не поиск подстроки."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/v1/users/author/followers/?search=reader1'
+            )
+        self.assertEqual(
+            [item['username'] for item in response.data['results']],
+            ['reader11', 'reader10']
+        )
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"username" LIKE \'reader1%\'', sql)
+
+    def test_own_follows_prefix_search(self):
+        self.client.force_authenticate(self.readers[0])
+        response = self.client.get('/api/v1/follow/?search=auth')
+        self.assertEqual(response.data['results'],
+                         [{'user': 'reader00', 'author': 'author'}])
+        response = self.client.get('/api/v1/follow/?search=uth')
+        self.assertEqual(response.data['results'], [])
+
+
+class ApiFollowUpdateTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        Follow.objects.create(user=cls.user, author=cls.authors[2])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def update(self, **data):
+        return self.client.post('/api/v1/follow/_update/', data,
+                                format='json')
+
+    def test_follow_and_unfollow_many(self):
+        """Проверяет, что подписка и отписка списком возвращают итоговое
+        состояние и повтор ничего не меняет."""
+        expected = {
+            'author0': True, 'author1': True, 'author2': False,
+            'test_user': False,
+        }
+        for _ in range(2):
+            response = self.update(
+                follow=['author0', 'author1', 'test_user'],
+                unfollow=['author2'],
+            )
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertEqual(response.data['following'], expected)
+        self.assertEqual(
+            set(self.user.follower.values_list('author__username',
+                                               flat=True)),
+            {'author0', 'author1'}
+        )
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.authors[0]).followers, 1
+        )
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.authors[2]).followers, 0
+        )
+
+    def test_invalid_updates(self):
+        cases = (
+            {'follow': ['nobody']},
+            {'follow': ['author0'], 'unfollow': ['author0']},
+        )
+        for data in cases:
+            with self.subTest(data=data):
+                response = self.update(**data)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.BAD_REQUEST)
+
+    def test_unfollow_user_named_like_action(self):
+        """Проверяет, что пути массовых действий не перекрывают отписку
+        от пользователей с именами bulk и update."""
+        for username in ('bulk', 'update'):
+            with self.subTest(username=username):
+                author = User.objects.create_user(username=username)
+                Follow.objects.create(user=self.user, author=author)
+                response = self.client.delete(f'/api/v1/follow/{username}/')
+                self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+                self.assertFalse(
+                    self.user.follower.filter(author=author).exists()
+                )
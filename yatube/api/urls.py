@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from .views import PostViewSet, GroupViewSet, CommentViewSet, FollowViewSet
+from .views import (BatchView, PostViewSet, GroupViewSet, CommentViewSet,
+                    FollowViewSet, UserFollowViewSet)
 
 router_v1 = SimpleRouter()
 
@@ -13,8 +14,10 @@ router_v1.register(
     basename='comment'
 )
 router_v1.register('follow', FollowViewSet, basename='follow')
+router_v1.register('users', UserFollowViewSet, basename='user-follows')
 
 urlpatterns = [
+    path('v1/batch/', BatchView.as_view(), name='batch'),
     path('v1/', include(router_v1.urls)),
     path('v1/', include('djoser.urls')),
     path('v1/', include('djoser.urls.jwt')),
@@ -1,66 +1,265 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 
 from posts.models import Post, Group, Comment, Follow
-from .mixins import ListCreateDestroyViewSet
+from posts.bulk import foreign_keys_checked
+from posts.caching import GROUPS_SCOPE, SITE_SCOPE
+from posts.follows import follow_authors, follow_list, update_follows
+from .batch import run_batch
+from .mixins import (BulkCreateMixin, ConditionalMixin, DeltaListMixin,
+                     ListCreateDestroyViewSet, ValuesListMixin)
+from .pagination import (CommentKeysetPagination, FollowKeysetPagination,
+                         KeysetPagination)
 from .permissions import AuthorOrReadOnly
 from .serializers import (PostSerializer, GroupSerializer, CommentSerializer,
-                          FollowSerializer)
-from .filters import PostFilter
+                          FollowSerializer, PostValuesSerializer,
+                          CommentValuesSerializer, FollowBulkSerializer,
+                          BatchSerializer, FollowerValuesSerializer,
+                          FollowingValuesSerializer, FollowUpdateSerializer,
+                          PostBulkSerializer, SELF_FOLLOW_ERROR)
+from .filters import CommentFilter, PostFilter, UsernamePrefixFilter
 
 User = get_user_model()
 
 
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all()
+class PostViewSet(ConditionalMixin, DeltaListMixin, ValuesListMixin,
+                  BulkCreateMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.select_related('author')
+    # в ответах есть имена авторов и названия сообществ
+    list_scopes = (SITE_SCOPE, 'feed')
+    detail_scopes = (SITE_SCOPE, 'post:{pk}')
     serializer_class = PostSerializer
+    bulk_serializer_class = PostBulkSerializer
+    values_serializer_class = PostValuesSerializer
     permission_classes = (
         AuthorOrReadOnly,
         permissions.IsAuthenticatedOrReadOnly
     )
+    pagination_class = KeysetPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = PostFilter
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def get_bulk_save_kwargs(self):
+        return {'author': self.request.user}
 
-class CommentViewSet(viewsets.ModelViewSet):
+    def perform_bulk_create(self, serializers):
+        group_ids = {
+            serializer.validated_data.get('group_id')
+            for serializer in serializers
+        }
+        groups = Group.objects.in_bulk(group_ids - {None})
+        valid = []
+        errors = []
+        for serializer in serializers:
+            group_id = serializer.validated_data.get('group_id')
+            if group_id is None or group_id in groups:
+                valid.append(serializer)
+                errors.append(None)
+                continue
+            errors.append({'status': status.HTTP_400_BAD_REQUEST,
+                           'errors': {'group': ['Сообщество не найдено.']}})
+        created = iter(super().perform_bulk_create(valid))
+        return [error or next(created) for error in errors]
+
+
+class CommentViewSet(ConditionalMixin, DeltaListMixin, ValuesListMixin,
+                     BulkCreateMixin, viewsets.ModelViewSet):
+    list_scopes = detail_scopes = (SITE_SCOPE, 'post:{post_id}')
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
     permission_classes = (
         permissions.IsAuthenticatedOrReadOnly,
         AuthorOrReadOnly,
     )
+    pagination_class = CommentKeysetPagination
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = CommentFilter
 
     def get_queryset(self):
         post_id = self.kwargs.get('post_id')
-        get_object_or_404(Post, id=post_id)
-        new_queryset = Comment.objects.filter(post=post_id)
-        return new_queryset
+        return Comment.objects.filter(post=post_id).select_related('author')
 
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # существование поста проверяется, только если комментариев нет;
+        # 304 по ETag отдаётся обычным HttpResponse и базу не трогает
+        data = getattr(response, 'data', None)
+        if isinstance(response, Response) and not (data or {}).get('results'):
+            get_object_or_404(Post, id=self.kwargs.get('post_id'))
+        return response
+
+    # пост не читается заранее: комментарий к несуществующему посту
+    # отвергает внешний ключ, и это превращается в 404
     def perform_create(self, serializer):
-        post_id = self.kwargs.get('post_id')
-        post = get_object_or_404(Post, id=post_id)
-        serializer.save(author=self.request.user, post=post)
+        try:
+            with foreign_keys_checked(Comment):
+                serializer.save(**self.get_bulk_save_kwargs())
+        except IntegrityError:
+            raise Http404
 
+    def perform_bulk_create(self, serializers):
+        try:
+            return super().perform_bulk_create(serializers)
+        except IntegrityError:
+            raise Http404
 
-class GroupViewSet(viewsets.ReadOnlyModelViewSet):
+    def get_bulk_save_kwargs(self):
+        return {'author': self.request.user,
+                'post_id': int(self.kwargs['post_id'])}
+
+
+class GroupViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    list_scopes = detail_scopes = (GROUPS_SCOPE,)
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
 
 
-class FollowViewSet(ListCreateDestroyViewSet):
+class FollowViewSet(BulkCreateMixin, ListCreateDestroyViewSet):
     queryset = Follow.objects.all()
     serializer_class = FollowSerializer
+    bulk_serializer_class = FollowBulkSerializer
     lookup_field = 'author__username'
     permission_classes = (permissions.IsAuthenticated,)
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('author__username',)
+    pagination_class = FollowKeysetPagination
+    filter_backends = (UsernamePrefixFilter,)
+    prefix_search_field = 'author__username'
 
     def get_queryset(self):
-        return self.request.user.follower.all()
+        return self.request.user.follower.select_related('user', 'author')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    def perform_bulk_create(self, serializers):
+        user = self.request.user
+        usernames = {
+            serializer.validated_data['author'] for serializer in serializers
+        }
+        authors = {
+            author.username: author
+            for author in User.objects.filter(username__in=usernames)
+        }
+        created_ids = follow_authors(
+            user, [author.pk for author in authors.values()]
+        )
+        results = []
+        for serializer in serializers:
+            username = serializer.validated_data['author']
+            author = authors.get(username)
+            if author is None:
+                errors = {'author': ['Пользователь не найден.']}
+            elif author == user:
+                errors = {'author': [SELF_FOLLOW_ERROR]}
+            else:
+                errors = None
+            if errors:
+                results.append({
+                    'status': status.HTTP_400_BAD_REQUEST, 'errors': errors
+                })
+                continue
+            # повтор в том же запросе — уже существующая подписка
+            created = author.pk in created_ids
+            created_ids.discard(author.pk)
+            results.append({
+                'status': (status.HTTP_201_CREATED if created
+                           else status.HTTP_200_OK),
+                'data': {'user': user.username, 'author': username},
+            })
+        return results
+
+    @action(detail=False, methods=['post'], url_path='_update')
+    def update_many(self, request):
+        """
+        {"follow": [имена], "unfollow": [имена]} — подписка и отписка одним
+        запросом. Повтор ничего не меняет; в ответе состояние подписок
+        на всех перечисленных авторов.
+        """
+        serializer = FollowUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        usernames = set(data['follow']) | set(data['unfollow'])
+        authors = dict(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'pk'))
+        missing = usernames - set(authors)
+        if missing:
+            raise ValidationError({'non_field_errors': [
+                f'Пользователи не найдены: {", ".join(sorted(missing))}'
+            ]})
+        state = update_follows(
+            request.user,
+            follow=[authors[name] for name in data['follow']],
+            unfollow=[authors[name] for name in data['unfollow']],
+        )
+        return Response({
+            'following': {name: state[pk] for name, pk in authors.items()}
+        })
+
+
+class UserFollowViewSet(viewsets.GenericViewSet):
+    """
+    users/<username>/followers/ и users/<username>/following/: подписчики
+    пользователя и авторы, на которых он подписан. Курсор — id подписки,
+    ?search= ищет по началу имени.
+    """
+    queryset = User.objects.all()
+    lookup_field = 'username'
+    lookup_value_regex = '[^/]+'
+    pagination_class = FollowKeysetPagination
+    values_serializers = {
+        'followers': FollowerValuesSerializer,
+        'following': FollowingValuesSerializer,
+    }
+
+    @action(detail=True)
+    def followers(self, request, username=None):
+        return self.follow_list(username, 'followers')
+
+    @action(detail=True)
+    def following(self, request, username=None):
+        return self.follow_list(username, 'following')
+
+    def follow_list(self, username, kind):
+        user = get_object_or_404(User, username=username)
+        serializer = self.values_serializers[kind](
+            context=self.get_serializer_context()
+        )
+        prefix = self.request.query_params.get('search', '').strip()
+        follows = follow_list(user, kind, prefix).values(
+            'id', *serializer.columns()
+        )
+        rows = self.paginate_queryset(follows)
+        return self.get_paginated_response(
+            [serializer.to_representation(row) for row in rows]
+        )
+
+
+class BatchView(APIView):
+    """
+    Несколько запросов к API за один HTTP-запрос и одну аутентификацию:
+    {"requests": [{"method": "GET", "path": "/api/v1/posts/1/"}, ...],
+     "parallel": true}. Ответы возвращаются в том же порядке; у каждого
+    свой статус, заголовки кэширования и тело.
+    """
+    permission_classes = (permissions.AllowAny,)
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        responses = run_batch(
+            request,
+            serializer.validated_data['requests'],
+            serializer.validated_data['parallel'],
+        )
+        return Response({'responses': responses})
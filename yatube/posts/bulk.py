@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+
+def send_saving(model, objects):
+    # pre_save до вставки: по нему, например, учитываются ссылки на
+    # загружаемые картинки
+    for obj in objects:
+        pre_save.send(
+            sender=model, instance=obj, raw=False,
+            using=obj._state.db, update_fields=None
+        )
+
+
+def send_created(model, objects):
+    # bulk_create не рассылает post_save, а на нём держатся ленты,
+    # счётчики, поисковый индекс и сброс кэша
+    for obj in objects:
+        post_save.send(
+            sender=model, instance=obj, created=True, raw=False,
+            using=obj._state.db, update_fields=None
+        )
+
+
+def send_deleted(model, objects):
+    for obj in objects:
+        post_delete.send(sender=model, instance=obj, using=obj._state.db)
+
+
+@contextmanager
+def foreign_keys_checked(model):
+    """
+    Транзакция, в конце которой проверены внешние ключи таблицы model.
+    Django создаёт их отложенными, и нарушение всплывает IntegrityError
+    только при коммите; внутри чужой транзакции проверка делается явно.
+    """
+    nested = connection.in_atomic_block
+    with transaction.atomic():
+        yield
+        if nested:
+            connection.check_constraints(table_names=[model._meta.db_table])
+
+
+def bulk_insert(model, objects):
+    """
+    Сохраняет новые объекты одной вставкой в одной транзакции. Если база
+    не возвращает ключи из bulk_create (в Django 2.2 их возвращает только
+    PostgreSQL), объекты сохраняются по одному в той же транзакции.
+    Ссылка на несуществующий объект даёт IntegrityError.
+    """
+    with foreign_keys_checked(model):
+        if connection.features.can_return_ids_from_bulk_insert:
+            send_saving(model, objects)
+            model.objects.bulk_create(objects)
+            send_created(model, objects)
+        else:
+            for obj in objects:
+                obj.save()
+    return objects
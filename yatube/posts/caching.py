@@ -0,0 +1,203 @@
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .holes import fill_holes
+
+FEED_GENERATION_KEY = 'feed:generation'
+# область, от которой зависят все страницы (например, имена пользователей)
+SITE_SCOPE = 'site'
+# список сообществ меняется только вместе с самими сообществами
+GROUPS_SCOPE = 'groups'
+
+
+def feed_generation():
+    """
+    Поколение ленты входит в ключи закэшированных фрагментов: после любого
+    изменения постов оно растёт, и старые фрагменты больше не читаются.
+    """
+    generation = cache.get(FEED_GENERATION_KEY)
+    if generation is None:
+        # если счётчик вытеснен из кэша, новый отсчёт начинается с текущего
+        # времени, чтобы не совпасть с поколениями, выданными раньше
+        cache.add(FEED_GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(FEED_GENERATION_KEY)
+    return generation
+
+
+def _incr_feed_generation():
+    try:
+        cache.incr(FEED_GENERATION_KEY)
+    except ValueError:
+        feed_generation()
+
+
+def bump_feed_generation():
+    """
+    Сдвигает поколение сразу и ещё раз после коммита: иначе запрос,
+    прочитавший данные до коммита, закэшировал бы их под новым поколением.
+    """
+    _incr_feed_generation()
+    transaction.on_commit(_incr_feed_generation)
+
+
+def feed_viewer(request, page):
+    """
+    Класс зрителя для ключа кэша: кнопку редактирования видит только автор
+    поста, остальным страница показывается одинаково. В общей копии
+    страницы вместо кнопок стоят метки, это отдельный вариант.
+    """
+    if getattr(request, 'punch_holes', False):
+        return 'holes'
+    user = request.user
+    if user.is_authenticated and any(
+        post.author_id == user.pk for post in page
+    ):
+        return f'author-{user.pk}'
+    return 'reader'
+
+
+def feed_page_position(request, page):
+    if getattr(page, 'is_cursor', False):
+        if request.GET.get('after'):
+            return f"after-{request.GET['after']}"
+        return f"before-{request.GET.get('before', '')}"
+    return f'page-{page.number}'
+
+
+def feed_cache_context(request, page):
+    """Переменные для тега {% cache %} вокруг ленты постов."""
+    key = '-'.join((
+        str(feed_generation()),
+        feed_page_position(request, page),
+        feed_viewer(request, page),
+    ))
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_cache_key': key,
+    }
+
+
+def scope_stamp(scope):
+    """
+    Время последнего изменения данных области: 'feed', 'groups',
+    'group:<slug>', 'profile:<username>', 'post:<id>'. Если отметки нет
+    в кэше, область считается изменённой только что. Области берутся из
+    адреса запроса, в том числе несуществующие, поэтому отметки живут
+    SCOPE_STAMP_TIMEOUT: истёкшая отметка ставится заново и лишь
+    сбрасывает кэш страниц области.
+    """
+    key = f'lastmod:{scope}'
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, time.time(), settings.SCOPE_STAMP_TIMEOUT)
+        stamp = cache.get(key)
+    return stamp
+
+
+def scopes_last_modified(scopes):
+    """Самая поздняя отметка изменения из перечисленных областей."""
+    return max(scope_stamp(scope) for scope in scopes)
+
+
+def http_last_modified(stamp):
+    """
+    Значение Last-Modified для отметки: секунда, округлённая вверх, и
+    только если она уже прошла. Изменение в ту же секунду получило бы
+    тот же заголовок, и клиент, приславший лишь If-Modified-Since,
+    получил бы 304 на устаревший ответ, поэтому такой ответ проверяется
+    только по ETag.
+    """
+    last_modified = math.ceil(stamp)
+    return last_modified if last_modified < time.time() else None
+
+
+def _touch(scopes):
+    now = time.time()
+    cache.set_many({f'lastmod:{scope}': now for scope in scopes},
+                   settings.SCOPE_STAMP_TIMEOUT)
+
+
+def touch_scopes(*scopes):
+    """Отмечает области изменёнными сейчас и ещё раз после коммита."""
+    scopes = [scope for scope in scopes if scope]
+    _touch(scopes)
+    transaction.on_commit(lambda: _touch(scopes))
+
+
+def page_cache(*scopes):
+    """
+    Кэширует GET-страницы целиком. scopes — шаблоны областей, которые
+    подставляются из аргументов view, например 'profile:{username}'.
+
+    Анонимным посетителям отдаётся готовая страница с ETag и
+    Last-Modified, посчитанными по отметкам областей, поэтому ответ 304
+    не требует ни базы, ни шаблонов. Для вошедших пользователей страница
+    рисуется один раз с метками на месте личных фрагментов (см.
+    posts.holes) и хранится общей копией, а на каждый запрос заполняются
+    только метки.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            names = [SITE_SCOPE] + [scope.format(**kwargs) for scope in scopes]
+            last_modified = scopes_last_modified(names)
+            digest = hashlib.md5(
+                f'{request.get_full_path()}|{last_modified}'.encode()
+            ).hexdigest()
+            if request.user.is_authenticated:
+                return _shared_page(request, view, args, kwargs, digest)
+            etag = quote_etag(digest)
+            header_last_modified = http_last_modified(last_modified)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=header_last_modified
+            )
+            if response is None:
+                response = _cached_page(
+                    f'page:{digest}', view, request, args, kwargs
+                )
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if header_last_modified is not None:
+                    response['Last-Modified'] = http_date(
+                        header_last_modified
+                    )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def _cached_page(key, view, request, args, kwargs):
+    content = cache.get(key)
+    if content is not None:
+        return HttpResponse(content)
+    response = view(request, *args, **kwargs)
+    if response.status_code == 200:
+        cache.set(key, response.content, settings.PAGE_CACHE_TIMEOUT)
+    return response
+
+
+def _shared_page(request, view, args, kwargs, digest):
+    request.punch_holes = True
+    try:
+        response = _cached_page(
+            f'shared-page:{digest}', view, request, args, kwargs
+        )
+    finally:
+        request.punch_holes = False
+    if response.status_code == 200:
+        content = fill_holes(request, response.content.decode())
+        response.content = content.encode()
+    patch_vary_headers(response, ('Cookie',))
+    return response
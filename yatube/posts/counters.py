@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import timeline
+from .models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+def change_comment_count(post_id, delta):
+    """Атомарно меняет счётчик комментариев поста одним UPDATE."""
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comment_count__gte=-delta)
+    posts.update(comment_count=F('comment_count') + delta)
+
+
+def rebuild_comment_counts():
+    """Пересчитывает счётчики комментариев всех постов по таблице Comment."""
+    comments = (
+        Comment.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Post.objects.update(comment_count=Coalesce(Subquery(comments), 0))
+
+
+def count_author_stats(user_id):
+    """Считает статистику автора по исходным таблицам."""
+    return {
+        'followers': Follow.objects.filter(author_id=user_id).count(),
+        'following': Follow.objects.filter(user_id=user_id).count(),
+        'posts': Post.objects.filter(author_id=user_id).count(),
+    }
+
+
+def change_author_stats(user_id, **deltas):
+    """
+    Атомарно меняет счётчики автора, например
+    change_author_stats(user.id, followers=1). Если записи ещё нет,
+    при увеличении она создаётся пересчётом; уменьшение без записи
+    пропускается, чтобы каскадное удаление автора её не воссоздало.
+    """
+    stats = AuthorStats.objects.filter(pk=user_id)
+    for field, delta in deltas.items():
+        if delta < 0:
+            stats = stats.filter(**{f'{field}__gte': -delta})
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    updated = stats.update(**changes)
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        ensure_author_stats(user_id)
+
+
+def ensure_author_stats(user_id):
+    counts = count_author_stats(user_id)
+    pulled = counts['followers'] > settings.TIMELINE_FANOUT_LIMIT
+    stats, _ = AuthorStats.objects.get_or_create(
+        pk=user_id, defaults={**counts, 'pulled': pulled}
+    )
+    return stats
+
+
+def get_author_stats(author):
+    """
+    Статистика автора. Если author получен с select_related('stats'),
+    дополнительных запросов нет.
+    """
+    try:
+        return author.stats
+    except AuthorStats.DoesNotExist:
+        return ensure_author_stats(author.pk)
+
+
+def reconcile_author_stats():
+    """Находит и исправляет расхождения счётчиков, возвращает их число."""
+    fixed = 0
+    for user_id in User.objects.values_list('pk', flat=True).iterator():
+        actual = count_author_stats(user_id)
+        stats, created = AuthorStats.objects.get_or_create(
+            pk=user_id, defaults=actual
+        )
+        current = {field: getattr(stats, field) for field in actual}
+        if created or current != actual:
+            AuthorStats.objects.filter(pk=user_id).update(**actual)
+            # исправленное число подписчиков может сменить режим ленты
+            timeline.sync_fanout(user_id)
+            fixed += 1
+    return fixed
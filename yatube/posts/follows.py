@@ -0,0 +1,137 @@
+from django.db import IntegrityError, connection, transaction
+
+from .bulk import send_created, send_deleted
+from .models import Follow
+from .search import prefix_match
+
+# вид списка -> (поле владельца списка, поле показываемого пользователя)
+FOLLOW_LISTS = {
+    'followers': ('author', 'user'),
+    'following': ('user', 'author'),
+}
+
+
+def follow_list(user, kind, prefix=''):
+    """
+    Подписки, в которых участвует user: его подписчики ('followers') или
+    авторы, на которых он подписан ('following'). prefix — начало имени
+    показываемого пользователя с учётом регистра, проверяется по
+    индексу username.
+    Сортировать и резать на страницы стоит по id подписки.
+    """
+    owner_field, person_field = FOLLOW_LISTS[kind]
+    follows = Follow.objects.filter(**{owner_field: user}).select_related(
+        person_field
+    )
+    if prefix:
+        follows = follows.filter(
+            prefix_match(f'{person_field}__username', prefix)
+        )
+    return follows
+
+
+def with_person(follows, kind):
+    """Проставляет каждой подписке person — пользователя из списка."""
+    person_field = FOLLOW_LISTS[kind][1]
+    for follow in follows:
+        follow.person = getattr(follow, person_field)
+    return follows
+
+
+def _returning(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _follow_table():
+    quote = connection.ops.quote_name
+    return quote(Follow._meta.db_table)
+
+
+def follow_authors(user, author_ids):
+    """
+    Подписывает user на авторов одной вставкой, уже существующие подписки
+    пропускаются самой базой (ON CONFLICT DO NOTHING), поэтому
+    параллельные запросы не падают на unique_follow. Возвращает id
+    авторов, подписка на которых действительно создана.
+    """
+    author_ids = set(author_ids) - {user.pk}
+    if not author_ids:
+        return set()
+    if connection.vendor == 'postgresql':
+        rows = _returning(
+            f'INSERT INTO {_follow_table()} (user_id, author_id) '
+            'SELECT %s, unnest(%s::integer[]) '
+            'ON CONFLICT DO NOTHING RETURNING id, author_id',
+            [user.pk, sorted(author_ids)]
+        )
+        follows = [
+            Follow(pk=pk, user=user, author_id=author_id)
+            for pk, author_id in rows
+        ]
+        send_created(Follow, follows)
+        return {follow.author_id for follow in follows}
+    # без RETURNING нельзя узнать, какие строки вставил bulk_create, а
+    # post_save для подписки, созданной параллельным запросом, испортил
+    # бы счётчики. Поэтому уже известные подписки отсеиваются, а каждая
+    # новая вставляется в своей точке сохранения: save() разошлёт
+    # post_save только для действительно вставленных
+    created = set()
+    for author_id in sorted(author_ids - _existing_follows(user, author_ids)):
+        try:
+            with transaction.atomic():
+                Follow(user=user, author_id=author_id).save(force_insert=True)
+        except IntegrityError:
+            continue
+        created.add(author_id)
+    return created
+
+
+def _existing_follows(user, author_ids):
+    return set(Follow.objects.filter(
+        user=user, author_id__in=author_ids
+    ).values_list('author_id', flat=True))
+
+
+def unfollow_authors(user, author_ids):
+    """
+    Отписывает user от авторов одним DELETE. Возвращает id авторов,
+    подписка на которых действительно была удалена.
+    """
+    author_ids = set(author_ids)
+    if not author_ids:
+        return set()
+    if connection.vendor == 'postgresql':
+        rows = _returning(
+            f'DELETE FROM {_follow_table()} '
+            'WHERE user_id = %s AND author_id = ANY(%s::integer[]) '
+            'RETURNING id, author_id',
+            [user.pk, sorted(author_ids)]
+        )
+        follows = [
+            Follow(pk=pk, user=user, author_id=author_id)
+            for pk, author_id in rows
+        ]
+        send_deleted(Follow, follows)
+        return {follow.author_id for follow in follows}
+    # без RETURNING удалённые определяются заранее; delete() сам разошлёт
+    # post_delete
+    follows = Follow.objects.filter(user=user, author_id__in=author_ids)
+    removed = set(follows.values_list('author_id', flat=True))
+    follows.delete()
+    return removed
+
+
+def update_follows(user, follow=(), unfollow=()):
+    """
+    Подписывает и отписывает user в одной транзакции. Повтор с теми же
+    аргументами ничего не меняет. Возвращает состояние после операции:
+    {id автора: подписан ли user}.
+    """
+    with transaction.atomic():
+        follow_authors(user, follow)
+        unfollow_authors(user, unfollow)
+    state = {author_id: author_id != user.pk for author_id in follow}
+    state.update({author_id: False for author_id in unfollow})
+    return state
@@ -2,14 +2,31 @@ from django.contrib.auth import get_user_model
 from django import forms
 
 from .models import Post, Comment
+from .uploads import check_upload, normalize_image
 
 User = get_user_model()
 
 
+class ImageUploadField(forms.ImageField):
+    """
+    Картинка с проверкой размера файла и размеров из заголовка до полного
+    декодирования и с приведением к хранимому виду.
+    """
+
+    def to_python(self, data):
+        if data not in self.empty_values:
+            check_upload(data)
+        image = super().to_python(data)
+        if image is None:
+            return None
+        return normalize_image(image)
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ['text', 'group', 'image']
+        field_classes = {'image': ImageUploadField}
 
 
 class CommentForm(forms.ModelForm):
@@ -20,3 +37,9 @@ class CommentForm(forms.ModelForm):
 
 class SearchUserForm(forms.Form):
     search = forms.CharField(label='Имя пользователя', max_length=100)
+
+
+class UsernamePrefixForm(forms.Form):
+    prefix = forms.CharField(
+        label='Начало имени пользователя', max_length=150, required=False
+    )
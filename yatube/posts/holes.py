@@ -0,0 +1,83 @@
+import base64
+import json
+import re
+
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from .models import Follow
+
+HOLE_RE = re.compile(r'<!--hole:(\w+):([\w=-]*)-->')
+
+RENDERERS = {}
+
+
+def renderer(name):
+    """Регистрирует функцию, которая отрисовывает «дырку» для зрителя."""
+    def decorator(func):
+        RENDERERS[name] = func
+        return func
+    return decorator
+
+
+def render_hole(request, name, args, context=None):
+    """
+    В общей для всех пользователей копии страницы вместо фрагмента
+    оставляется метка, в обычном режиме фрагмент рисуется сразу.
+    """
+    if getattr(request, 'punch_holes', False):
+        payload = base64.urlsafe_b64encode(json.dumps(args).encode())
+        return mark_safe(f'<!--hole:{name}:{payload.decode()}-->')
+    return mark_safe(RENDERERS[name](request, context or {}, *args))
+
+
+def fill_holes(request, content):
+    """Заполняет метки фрагментами для текущего пользователя."""
+    def fill(match):
+        args = json.loads(base64.urlsafe_b64decode(match.group(2)))
+        return RENDERERS[match.group(1)](request, {}, *args)
+    return HOLE_RE.sub(fill, content)
+
+
+@renderer('nav_user')
+def nav_user(request, context):
+    return render_to_string(
+        'includes/holes/nav_user.html', {'user': request.user}
+    )
+
+
+@renderer('edit_button')
+def edit_button(request, context, username, post_id, author_id):
+    if request.user.pk != author_id:
+        return ''
+    return render_to_string(
+        'includes/holes/edit_button.html',
+        {'username': username, 'post_id': post_id}
+    )
+
+
+@renderer('follow_button')
+def follow_button(request, context, username, author_id):
+    user = request.user
+    if not user.is_authenticated or user.pk == author_id:
+        return ''
+    if 'following' in context:
+        following = context['following']
+    else:
+        following = Follow.objects.filter(
+            user=user, author_id=author_id
+        ).exists()
+    return render_to_string(
+        'includes/holes/follow_button.html',
+        {'username': username, 'following': following}
+    )
+
+
+@renderer('csrf_token')
+def csrf_token(request, context):
+    return format_html(
+        '<input type="hidden" name="csrfmiddlewaretoken" value="{}">',
+        get_token(request)
+    )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts import mediafiles
+from posts.models import Post
+from posts.storage import content_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в хранилище по содержимому и '
+        'пересчитывает ссылки на файлы'
+    )
+
+    def handle(self, *args, **options):
+        moved = set()
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        for post in posts.iterator():
+            old_name = mediafiles.move_to_content_storage(post)
+            if old_name is not None:
+                moved.add(old_name)
+        still_used = set(
+            Post.objects.filter(image__in=moved).values_list(
+                'image', flat=True
+            )
+        )
+        for name in moved - still_used:
+            content_storage.delete(name)
+        collected = mediafiles.rebuild_refcounts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {len(moved)}, '
+            f'удалено файлов без ссылок: {collected}'
+        ))
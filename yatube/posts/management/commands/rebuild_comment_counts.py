@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики комментариев у постов'
+
+    def handle(self, *args, **options):
+        updated = counters.rebuild_comment_counts()
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено постов: {updated}')
+        )
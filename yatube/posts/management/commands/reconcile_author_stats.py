@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики авторов с таблицами и исправляет расхождения'
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile_author_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено записей статистики: {fixed}')
+        )
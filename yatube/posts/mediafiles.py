@@ -0,0 +1,106 @@
+import posixpath
+
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from . import thumbnails
+from .models import MediaFile, Post
+from .storage import content_name, content_storage, is_content_name
+
+
+def acquire(name):
+    """Учитывает ещё одну ссылку на файл."""
+    if not name:
+        return
+    files = MediaFile.objects.filter(name=name)
+    if files.update(refcount=F('refcount') + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaFile.objects.create(name=name, refcount=1)
+    except IntegrityError:
+        files.update(refcount=F('refcount') + 1)
+
+
+def acquire_upload(post):
+    """
+    Учитывает ссылку на картинку, которую пост ещё только загружает, до
+    записи файла: иначе хранилище может найти такой же файл, а collect
+    удалить его раньше, чем пост на него сошлётся. Возвращает имя файла
+    или None, если загрузки нет. Если сохранение поста сорвётся, ссылка
+    останется лишней, и файл удалит только rebuild_refcounts.
+    """
+    image = post.image
+    if not image or image._committed:
+        return None
+    name = content_name(image.field.generate_filename(post, image.name),
+                        image)
+    acquire(name)
+    return name
+
+
+def release(name):
+    """
+    Снимает ссылку на файл. Файл без ссылок удаляется после коммита,
+    если к тому времени на него снова никто не сослался.
+    """
+    if not name:
+        return
+    MediaFile.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1
+    )
+    transaction.on_commit(lambda: collect(name))
+
+
+def collect(name):
+    """Удаляет файл, если на него не осталось ссылок."""
+    with transaction.atomic():
+        orphan = MediaFile.objects.select_for_update().filter(
+            name=name, refcount=0
+        ).first()
+        if orphan is None:
+            return False
+        thumbnails.forget_image(name)
+        content_storage.delete(name)
+        orphan.delete()
+    return True
+
+
+def rebuild_refcounts():
+    """
+    Пересчитывает ссылки по таблице постов и удаляет файлы без ссылок.
+    Возвращает число удалённых файлов.
+    """
+    counts = dict(
+        Post.objects.exclude(image='').exclude(image__isnull=True)
+        .order_by().values_list('image').annotate(total=Count('id'))
+    )
+    for name, total in counts.items():
+        updated = MediaFile.objects.filter(name=name).update(refcount=total)
+        if not updated:
+            MediaFile.objects.create(name=name, refcount=total)
+    MediaFile.objects.exclude(name__in=counts).update(refcount=0)
+    orphans = MediaFile.objects.filter(refcount=0).values_list(
+        'name', flat=True
+    )
+    return sum(collect(name) for name in list(orphans))
+
+
+def move_to_content_storage(post):
+    """
+    Переносит картинку поста, сохранённую под исходным именем, в
+    хранилище по содержимому. Возвращает прежнее имя или None, если
+    переносить нечего.
+    """
+    name = post.image.name
+    if not name or is_content_name(name):
+        return None
+    if not content_storage.exists(name):
+        return None
+    with content_storage.open(name) as file:
+        # сохраняется как новая загрузка: ссылку учтёт обработчик
+        # pre_save, а post_save пересоздаст миниатюры
+        post.image = File(file, posixpath.basename(name))
+        post.save(update_fields=['image'])
+    return name
@@ -0,0 +1,89 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+
+
+def tokenize(text):
+    text = (text or '').lower().replace('ё', 'е')
+    return [word[:64] for word in re.findall(r'\w+', text)]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return fill_search_terms(apps)
+    post_table = apps.get_model('posts', 'Post')._meta.db_table
+    user_table = apps.get_model(
+        *settings.AUTH_USER_MODEL.split('.'))._meta.db_table
+    schema_editor.execute(
+        f"CREATE INDEX posts_post_text_fts ON {post_table} "
+        f"USING gin (to_tsvector('russian', text))"
+    )
+    schema_editor.execute(
+        f"CREATE INDEX posts_user_name_fts ON {user_table} "
+        f"USING gin (to_tsvector('simple', username || ' ' || "
+        f"first_name || ' ' || last_name))"
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS posts_post_text_fts')
+    schema_editor.execute('DROP INDEX IF EXISTS posts_user_name_fts')
+
+
+def fill_search_terms(apps):
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    Post = apps.get_model('posts', 'Post')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    terms = []
+    for post_id, text in Post.objects.values_list('id', 'text'):
+        words = tokenize(text)
+        terms += [
+            SearchTerm(term=term, post_id=post_id, weight=words.count(term))
+            for term in set(words)
+        ]
+    for user in User.objects.all():
+        words = tokenize(
+            f'{user.username} {user.first_name} {user.last_name}'
+        )
+        if user.username.lower()[:64] not in words:
+            words.append(user.username.lower()[:64])
+        terms += [
+            SearchTerm(term=term, user_id=user.pk, weight=words.count(term))
+            for term in set(words)
+        ]
+    SearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_authorstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Терм')),
+                ('weight', models.PositiveIntegerField(default=1, verbose_name='Вес')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'post'], name='search_term_post'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'user'], name='search_term_user'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
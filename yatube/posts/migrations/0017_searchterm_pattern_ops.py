@@ -0,0 +1,29 @@
+# Generated by Django 2.2.6 on 2026-10-18 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_authorstats_pulled'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='searchterm',
+            name='search_term_post',
+        ),
+        migrations.RemoveIndex(
+            model_name='searchterm',
+            name='search_term_user',
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'post'], name='search_term_post', opclasses=['varchar_pattern_ops', 'int4_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'user'], name='search_term_user', opclasses=['varchar_pattern_ops', 'int4_ops']),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import content_storage
+
 User = get_user_model()
 
 
@@ -20,10 +22,26 @@ class Post(models.Model):
         on_delete=models.SET_NULL,
         verbose_name='Сообщество'
     )
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(
+        upload_to='posts/',
+        storage=content_storage,
+        blank=True,
+        null=True
+    )
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            # посты автора по убыванию даты: профиль и авторы, чьи посты
+            # подмешиваются в ленту подписок при чтении
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -84,3 +102,138 @@ class Follow(models.Model):
                 fields=['user', 'author'],
                 name='unique_follow')
         ]
+
+
+class TimelineEntry(models.Model):
+    """
+    Материализованная лента подписок: запись появляется у каждого
+    подписчика при публикации поста (fan-out on write).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    # копия Post.pub_date: лента читается по индексу без join с постами
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики для карточки автора, обновляются при изменениях."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    followers = models.PositiveIntegerField('Подписчиков', default=0)
+    following = models.PositiveIntegerField('Подписок', default=0)
+    posts = models.PositiveIntegerField('Записей', default=0)
+    # посты автора не раскладываются по лентам, а подмешиваются при чтении
+    pulled = models.BooleanField('Лента при чтении', default=False)
+
+    def __str__(self):
+        return f'Статистика {self.user_id}'
+
+
+class SearchTerm(models.Model):
+    """
+    Инвертированный индекс встроенного поискового движка: терм из текста
+    поста или из имени пользователя и число его вхождений.
+    """
+    term = models.CharField('Терм', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='search_terms',
+        verbose_name='Пост'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='search_terms',
+        verbose_name='Пользователь'
+    )
+    weight = models.PositiveIntegerField('Вес', default=1)
+
+    class Meta:
+        indexes = [
+            # varchar_pattern_ops — для поиска по началу терма через
+            # LIKE в PostgreSQL, другие СУБД классы операторов не видят
+            models.Index(fields=['term', 'post'], name='search_term_post',
+                         opclasses=['varchar_pattern_ops', 'int4_ops']),
+            models.Index(fields=['term', 'user'], name='search_term_user',
+                         opclasses=['varchar_pattern_ops', 'int4_ops']),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class ImageVariant(models.Model):
+    """
+    Уменьшенная копия картинки поста для srcset: своя ширина и формат.
+    source — имя картинки, из которой сделана копия: после замены
+    картинки варианты старой удаляются.
+    """
+    FORMATS = (
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+        verbose_name='Пост'
+    )
+    source = models.CharField('Исходная картинка', max_length=255)
+    format = models.CharField('Формат', max_length=8, choices=FORMATS)
+    width = models.PositiveSmallIntegerField('Ширина')
+    height = models.PositiveSmallIntegerField('Высота')
+    name = models.CharField('Файл', max_length=255)
+
+    class Meta:
+        ordering = ('format', 'width')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'source', 'format', 'width'],
+                name='unique_image_variant')
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class MediaFile(models.Model):
+    """
+    Файл в хранилище по содержимому и число постов, которые на него
+    ссылаются. Файл без ссылок удаляется после коммита.
+    """
+    name = models.CharField('Файл', max_length=255, unique=True)
+    refcount = models.PositiveIntegerField('Ссылок', default=0)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,173 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+CURSOR_PARAMS = ('before', 'after')
+
+
+def seek(keys, values, lookup):
+    """
+    Условие (k1, k2, ...) < (v1, v2, ...) в виде, который понимает
+    любая СУБД: k1 < v1 OR (k1 = v1 AND k2 < v2) ...
+    """
+    condition = Q()
+    for position, key in enumerate(keys):
+        step = Q(**{f'{key}__{lookup}': values[position]})
+        for previous in range(position):
+            step &= Q(**{keys[previous]: values[previous]})
+        condition |= step
+    return condition
+
+
+class CursorPage:
+    """
+    Страница ленты, полученная по курсору. Повторяет ту часть интерфейса
+    django.core.paginator.Page, которую используют шаблоны.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode(self.object_list[-1])
+
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode(self.object_list[0])
+
+
+class CursorPaginator:
+    """
+    Пагинация по ключу (keyset): страницы выбираются условием на значения
+    полей последней показанной записи, поэтому не нужны ни COUNT(*),
+    ни OFFSET. Записи отдаются по убыванию полей keys, последнее поле
+    должно быть уникальным.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = keys
+
+    def encode(self, obj):
+        values = [self._value(obj, key) for key in self.keys]
+        raw = json.dumps(values, default=str).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, token):
+        """Возвращает значения ключей из токена или None, если токен битый."""
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            values = json.loads(raw.decode())
+            if len(values) != len(self.keys):
+                return None
+            model = self.object_list.model
+            return [
+                model._meta.get_field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def get_page(self, before=None, after=None):
+        """
+        before — токен, после которого идут более старые записи,
+        after — токен, перед которым идут более новые. Неверный токен
+        отдаёт первую страницу, как Paginator.get_page для неверного номера.
+        """
+        after_values = self.decode(after)
+        before_values = None if after_values else self.decode(before)
+        window = self.per_page + 1
+        if after_values:
+            rows = self._window(after_values, 'gt', window)
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(rows, self, True, has_previous)
+        rows = self._window(before_values, 'lt', window)
+        has_next = len(rows) > self.per_page
+        return CursorPage(
+            rows[:self.per_page], self, has_next, before_values is not None
+        )
+
+    def _window(self, values, lookup, limit):
+        """
+        Первые limit записей за значениями ключей values: по возрастанию
+        ключей для lookup='gt' и по убыванию для 'lt'. Список, который
+        собирается не одним запросом, выбирает окно сам методом window.
+        """
+        window = getattr(self.object_list, 'window', None)
+        if window is not None:
+            return window(values, lookup, limit)
+        queryset = self.object_list
+        if values:
+            queryset = queryset.filter(seek(self.keys, values, lookup))
+        if lookup == 'gt':
+            ordering = self.keys
+        else:
+            ordering = [f'-{key}' for key in self.keys]
+        return list(queryset.order_by(*ordering)[:limit])
+
+    @staticmethod
+    def _value(obj, key):
+        if isinstance(obj, dict):
+            return obj[key]
+        return getattr(obj, key)
+
+
+def get_page(request, object_list, per_page=None):
+    """
+    Возвращает страницу ленты. Курсорный режим включается настройкой
+    CURSOR_PAGINATION или самим запросом с параметром before/after.
+    """
+    per_page = per_page or settings.PAGE_SIZE
+    if settings.CURSOR_PAGINATION or any(
+        request.GET.get(param) for param in CURSOR_PARAMS
+    ):
+        return get_cursor_page(request, object_list, per_page=per_page)
+    paginator = Paginator(object_list, per_page)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def get_cursor_page(request, object_list, keys=('pub_date', 'id'),
+                    per_page=None):
+    """Страница по курсору из параметров before/after запроса."""
+    paginator = CursorPaginator(
+        object_list, per_page or settings.PAGE_SIZE, keys
+    )
+    return paginator.get_page(
+        **{param: request.GET.get(param) for param in CURSOR_PARAMS}
+    )
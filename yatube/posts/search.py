@@ -0,0 +1,226 @@
+import hashlib
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+from django.utils.module_loading import import_string
+
+from .models import Post, SearchTerm
+
+User = get_user_model()
+
+TERM_MAX_LENGTH = 64
+# сколько слов запроса учитывается
+QUERY_MAX_TERMS = 5
+# короче этой длины слово ищется точно, длиннее — как префикс
+PREFIX_MIN_LENGTH = 3
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    Разбивает текст на термы. Регистр сворачивается средствами Python,
+    поэтому кириллица ищется без учёта регистра на любой СУБД.
+    """
+    text = (text or '').lower().replace('ё', 'е')
+    return [word[:TERM_MAX_LENGTH] for word in WORD_RE.findall(text)]
+
+
+def normalize_query(query):
+    """Приводит запрос к виду, одинаковому для равнозначных запросов."""
+    return ' '.join(dict.fromkeys(tokenize(query)))
+
+
+def prefix_match(field, prefix):
+    """
+    Условие «field начинается с prefix»: LIKE 'prefix%'. Сравнение
+    диапазоном здесь не годится: при сортировке, отличной от C, строки
+    с началом prefix не обязаны идти подряд. В PostgreSQL такой LIKE
+    идёт по индексу с классом операторов varchar_pattern_ops: Django
+    создаёт его сам для CharField с unique или db_index (в том числе
+    для auth_user.username), для термов он задан в SearchTerm.
+
+    Регистр учитывается (в SQLite — кроме латиницы, там LIKE его не
+    различает): термы поиска уже приведены к нижнему регистру, а имя
+    пользователя нужно набирать как есть.
+    """
+    return Q(**{f'{field}__startswith': prefix})
+
+
+def get_search_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def cached_search(kind, query, limit):
+    """
+    id результатов поиска kind ('post' или 'user') по нормализованному
+    запросу. Список кэшируется на SEARCH_CACHE_TIMEOUT секунд.
+    """
+    query = normalize_query(query)
+    if not query:
+        return []
+    digest = hashlib.md5(query.encode()).hexdigest()
+    key = f'search:{kind}:{limit}:{digest}'
+    ids = cache.get(key)
+    if ids is None:
+        backend = get_search_backend()
+        ids = getattr(backend, f'{kind}_ids')(query, limit)
+        cache.set(key, ids, settings.SEARCH_CACHE_TIMEOUT)
+    return ids
+
+
+def posts_by_ids(ids):
+    posts = Post.objects.select_related('author').in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def users_by_ids(ids):
+    users = User.objects.select_related('stats').in_bulk(ids)
+    return [users[pk] for pk in ids if pk in users]
+
+
+class BaseSearchBackend:
+    def post_ids(self, query, limit):
+        """id найденных постов, самые подходящие первыми."""
+        raise NotImplementedError
+
+    def user_ids(self, query, limit):
+        """id найденных пользователей, самые подходящие первыми."""
+        raise NotImplementedError
+
+    def search_posts(self, query, limit):
+        return posts_by_ids(self.post_ids(query, limit))
+
+    def search_users(self, query, limit):
+        return users_by_ids(self.user_ids(query, limit))
+
+    def index_post(self, post):
+        """Обновляет индекс после сохранения поста."""
+
+    def index_user(self, user):
+        """Обновляет индекс после сохранения пользователя."""
+
+    def rebuild(self):
+        """Полностью перестраивает индекс."""
+
+
+class InvertedIndexBackend(BaseSearchBackend):
+    """
+    Встроенный движок на таблице SearchTerm. Работает на любой СУБД,
+    префиксный поиск идёт по индексу (term, post) через LIKE.
+    """
+
+    def post_ids(self, query, limit):
+        return self._search('post', query, limit)
+
+    def user_ids(self, query, limit):
+        return self._search('user', query, limit)
+
+    @transaction.atomic
+    def index_post(self, post):
+        SearchTerm.objects.filter(post=post).delete()
+        SearchTerm.objects.bulk_create(
+            self._entries(tokenize(post.text), post=post)
+        )
+
+    @transaction.atomic
+    def index_user(self, user):
+        SearchTerm.objects.filter(user=user).delete()
+        words = tokenize(
+            f'{user.username} {user.first_name} {user.last_name}'
+        )
+        username = user.username.lower()[:TERM_MAX_LENGTH]
+        if username not in words:
+            words.append(username)
+        SearchTerm.objects.bulk_create(self._entries(words, user=user))
+
+    @transaction.atomic
+    def rebuild(self):
+        SearchTerm.objects.all().delete()
+        for post in Post.objects.only('pk', 'text').iterator():
+            self.index_post(post)
+        for user in User.objects.iterator():
+            self.index_user(user)
+
+    @staticmethod
+    def _entries(words, **target):
+        return [
+            SearchTerm(term=term, weight=weight, **target)
+            for term, weight in Counter(words).items()
+        ]
+
+    @staticmethod
+    def _match(word):
+        if len(word) < PREFIX_MIN_LENGTH:
+            return Q(term=word)
+        return prefix_match('term', word)
+
+    def _search(self, field, query, limit):
+        """
+        Возвращает id объектов, содержащих все слова запроса, по убыванию
+        суммарного веса совпавших термов.
+        """
+        words = list(dict.fromkeys(tokenize(query)))[:QUERY_MAX_TERMS]
+        if not words:
+            return []
+        matches = [self._match(word) for word in words]
+        any_match = Q()
+        for match in matches:
+            any_match |= match
+        flags = {
+            f'match_{number}': Max(Case(
+                When(match, then=1), default=0, output_field=IntegerField()
+            ))
+            for number, match in enumerate(matches)
+        }
+        rows = (
+            SearchTerm.objects.filter(any_match, **{f'{field}__isnull': False})
+            .values(field)
+            .annotate(score=Sum('weight'), **flags)
+            .filter(**{flag: 1 for flag in flags})
+            .order_by('-score', f'-{field}')
+        )
+        return [row[field] for row in rows[:limit]]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Полнотекстовый поиск PostgreSQL: посты — по tsvector с русской
+    морфологией, пользователи — префиксно по конфигурации simple.
+    Выражения совпадают с GIN-индексами из миграции, индекс обновляет
+    сама база, поэтому index_post и index_user ничего не делают.
+    """
+    post_vector = f"to_tsvector('russian', {Post._meta.db_table}.text)"
+    user_vector = (
+        "to_tsvector('simple', {table}.username || ' ' || "
+        "{table}.first_name || ' ' || {table}.last_name)"
+    ).format(table=User._meta.db_table)
+
+    def post_ids(self, query, limit):
+        tsquery = "plainto_tsquery('russian', %s)"
+        posts = Post.objects.extra(
+            select={'rank': f'ts_rank({self.post_vector}, {tsquery})'},
+            select_params=[query],
+            where=[f'{self.post_vector} @@ {tsquery}'],
+            params=[query],
+        ).order_by('-rank', '-pub_date')
+        return list(posts.values_list('id', flat=True)[:limit])
+
+    def user_ids(self, query, limit):
+        words = list(dict.fromkeys(tokenize(query)))[:QUERY_MAX_TERMS]
+        if not words:
+            return []
+        prefix_query = ' & '.join(f'{word}:*' for word in words)
+        tsquery = "to_tsquery('simple', %s)"
+        users = User.objects.extra(
+            select={'rank': f'ts_rank({self.user_vector}, {tsquery})'},
+            select_params=[prefix_query],
+            where=[f'{self.user_vector} @@ {tsquery}'],
+            params=[prefix_query],
+        ).order_by('-rank', 'username')
+        return list(users.values_list('id', flat=True)[:limit])
@@ -0,0 +1,187 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import counters, mediafiles, thumbnails, timeline
+from .caching import (GROUPS_SCOPE, SITE_SCOPE, bump_feed_generation,
+                      touch_scopes)
+from .models import Comment, Follow, Group, ImageVariant, Post
+from .search import get_search_backend
+
+User = get_user_model()
+
+# посты, которые удаляются в этом потоке: их комментарии удаляются
+# каскадом раньше самого поста
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+def profile_scopes(*user_ids):
+    usernames = User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True
+    )
+    return [f'profile:{username}' for username in usernames]
+
+
+def post_scopes(post):
+    """Области кэша страниц, на которых показывается пост."""
+    group_ids = {post.group_id, getattr(post, '_original_group_id', None)}
+    slugs = Group.objects.filter(pk__in=group_ids - {None}).values_list(
+        'slug', flat=True
+    )
+    return [
+        'feed',
+        f'post:{post.pk}',
+        *profile_scopes(post.author_id),
+        *[f'group:{slug}' for slug in slugs],
+    ]
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    # запоминаем сообщество, чтобы при переносе поста сбросить кэш
+    # страницы прежнего сообщества
+    instance._original_group_id = instance.__dict__.get('group_id')
+    # и картинку, чтобы создавать миниатюру только для новой
+    instance._original_image = str(instance.__dict__.get('image') or '')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if created:
+        counters.ensure_author_stats(instance.pk)
+    # при входе сохраняется только last_login, индекс не меняется
+    if update_fields != frozenset({'last_login'}):
+        get_search_backend().index_user(instance)
+        bump_feed_generation()
+        touch_scopes(SITE_SCOPE)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    touch_scopes(SITE_SCOPE)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._acquired_image = mediafiles.acquire_upload(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        timeline.fan_out_post(instance)
+        counters.change_author_stats(instance.author_id, posts=1)
+    get_search_backend().index_post(instance)
+    bump_feed_generation()
+    touch_scopes(*post_scopes(instance))
+    instance._original_group_id = instance.group_id
+    # ссылку на загруженную картинку уже учёл post_saving
+    acquired = getattr(instance, '_acquired_image', None)
+    instance._acquired_image = None
+    changed = instance.image.name != instance._original_image
+    referenced = created or changed
+    if acquired and (not referenced or acquired != instance.image.name):
+        mediafiles.release(acquired)
+    if referenced and instance.image.name != acquired:
+        mediafiles.acquire(instance.image.name)
+    if changed:
+        if not created:
+            mediafiles.release(instance._original_image)
+        thumbnails.forget_variants(instance)
+        thumbnails.schedule(instance)
+        instance._original_image = instance.image.name
+
+
+@receiver(thumbnails.thumbnail_ready)
+def thumbnail_ready(sender, post_id, **kwargs):
+    # страницы с заглушкой вместо картинки больше не годятся
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        bump_feed_generation()
+        touch_scopes(*post_scopes(post))
+
+
+@receiver(post_delete, sender=ImageVariant)
+def image_variant_deleted(sender, instance, **kwargs):
+    thumbnails.delete_variant_file(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+    mediafiles.release(instance.image.name)
+    counters.change_author_stats(instance.author_id, posts=-1)
+    bump_feed_generation()
+    touch_scopes(*post_scopes(instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_author_stats(instance.author_id, followers=1)
+        counters.change_author_stats(instance.user_id, following=1)
+        timeline.sync_fanout(instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+        touch_scopes(*profile_scopes(instance.user_id, instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+    counters.change_author_stats(instance.author_id, followers=-1)
+    counters.change_author_stats(instance.user_id, following=-1)
+    timeline.sync_fanout(instance.author_id)
+    touch_scopes(*profile_scopes(instance.user_id, instance.author_id))
+
+
+def comment_changed(comment):
+    bump_feed_generation()
+    post = Post.objects.filter(pk=comment.post_id).first()
+    if post is not None:
+        touch_scopes(*post_scopes(post))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comment_count(instance.post_id, 1)
+        comment_changed(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    # счётчик удаляемого поста не нужен, а кэш сбросит post_deleted
+    # один раз на пост, а не на каждый комментарий
+    if instance.post_id in deleting_posts():
+        return
+    counters.change_comment_count(instance.post_id, -1)
+    comment_changed(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_feed_generation()
+        # название сообщества есть в карточках постов на всех страницах
+        touch_scopes(SITE_SCOPE, GROUPS_SCOPE)
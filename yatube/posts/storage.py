@@ -0,0 +1,58 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# имя файла по содержимому: <каталог>/ab/cd/abcd…(64 символа).ext
+CONTENT_NAME = re.compile(r'(^|/)([0-9a-f]{2})/([0-9a-f]{2})/\2\3[0-9a-f]{60}'
+                          r'(\.\w+)?$')
+
+
+def content_name(name, content):
+    """
+    Имя файла по SHA-256 содержимого в каталоге исходного имени. Два
+    уровня подкаталогов по два символа хэша держат в каждом каталоге
+    не больше 256 элементов.
+    """
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    key = digest.hexdigest()
+    extension = os.path.splitext(name)[1].lower()
+    return posixpath.join(
+        posixpath.dirname(name), key[:2], key[2:4], f'{key}{extension}'
+    )
+
+
+def is_content_name(name):
+    return bool(CONTENT_NAME.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором файл называется хэшем своего содержимого.
+    Повторная загрузка того же файла не пишет его снова, а возвращает
+    имя уже сохранённого; учёт ссылок на файлы ведёт posts.mediafiles.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_name(name, content)
+        if self.exists(name):
+            return name
+        saved = super().save(name, content, max_length)
+        if saved != name:
+            # такой же файл успел сохранить параллельный запрос
+            self.delete(saved)
+        return name
+
+
+content_storage = ContentAddressedStorage()
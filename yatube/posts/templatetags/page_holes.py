@@ -0,0 +1,10 @@
+from django import template
+
+from posts.holes import render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    return render_hole(context.get('request'), name, args, context)
@@ -0,0 +1,30 @@
+from django import template
+from django.conf import settings
+
+from posts.thumbnails import cached_thumbnail, schedule
+
+register = template.Library()
+
+
+@register.simple_tag
+def card_thumbnail(post):
+    """
+    Готовая миниатюра картинки поста или None. Миниатюра создаётся в
+    фоне при сохранении поста; если её ещё нет (старый пост, очищенный
+    кэш), она ставится в очередь, а страница показывает заглушку.
+    """
+    if not post.image:
+        return None
+    if hasattr(post, 'card_thumbnail'):
+        # view уже прочитал миниатюры всей страницы (resolve_thumbnails)
+        thumbnail = post.card_thumbnail
+        ready = thumbnail is not None and (
+            post.image_sources or not settings.IMAGE_VARIANT_FORMATS
+        )
+    else:
+        thumbnail = cached_thumbnail(post.image.name)
+        ready = thumbnail is not None
+    if not ready:
+        # нет миниатюры или вариантов для srcset (пост старше конвейера)
+        schedule(post)
+    return thumbnail
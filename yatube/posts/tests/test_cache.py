@@ -1,20 +1,37 @@
+import math
+import time
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
+from django.utils.http import http_date
+
+from posts.caching import SITE_SCOPE, scopes_last_modified
+from posts.models import Comment, Post
 
 User = get_user_model()
 
+# часы, по которым ставятся отметки областей и считается Last-Modified
+CLOCK = 'posts.caching.time.time'
+
 
 class CacheTests(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username='test_user')
+        cls.other_user = User.objects.create_user(username='other_user')
 
     def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        self.other_client = Client()
+        self.other_client.force_login(self.other_user)
 
     def test_cache_index(self):
         test_text = 'Тестовый текст для проверки кэша'
@@ -26,10 +43,167 @@ class CacheTests(TestCase):
             reverse('new_post'),
             data={'text': test_text}
         )
-        # Проверяем, что он не появился на index
+        # Новый пост сбрасывает кэш ленты и сразу появляется на index
         response_2 = self.authorized_client.get(reverse('index'))
-        self.assertNotContains(response_2, test_text)
-        # Чистим кэш
+        self.assertContains(response_2, test_text)
+
+    def test_cache_serves_fragment_until_invalidated(self):
+        """Проверяет, что без событий лента отдаётся из кэша, а правка
+        поста или комментарий сбрасывают его."""
+        post = Post.objects.create(text='Старый текст', author=self.user)
+        self.guest_client.get(reverse('index'))
+        # update() не отправляет сигналы, поэтому кэш не сбрасывается
+        Post.objects.filter(pk=post.pk).update(text='Тихо изменённый текст')
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Старый текст')
+        Comment.objects.create(post=post, author=self.user, text='Коммент')
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Тихо изменённый текст')
+        post.text = 'Новый текст'
+        post.save()
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Новый текст')
+
+    def test_cache_key_depends_on_page(self):
+        for number in range(13):
+            Post.objects.create(text=f'Пост номер {number}', author=self.user)
+        self.guest_client.get(reverse('index'))
+        response = self.guest_client.get(reverse('index') + '?page=2')
+        self.assertContains(response, 'Пост номер 0')
+        self.assertNotContains(response, 'Пост номер 12')
+
+    def test_cache_does_not_leak_edit_button(self):
+        post = Post.objects.create(text='Пост автора', author=self.user)
+        edit_url = reverse(
+            'post_edit',
+            kwargs={'username': self.user.username, 'post_id': post.id}
+        )
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, edit_url)
+        for client in (self.other_client, self.guest_client):
+            with self.subTest(client=client):
+                response = client.get(reverse('index'))
+                self.assertNotContains(response, edit_url)
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.post = Post.objects.create(text='Текст поста', author=cls.user)
+
+    def setUp(self):
         cache.clear()
-        response_3 = self.authorized_client.get(reverse('index'))
-        self.assertContains(response_3, test_text)
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_conditional_get(self):
+        """Проверяет, что анонимным посетителям отдаются ETag и
+        Last-Modified, а повторный запрос с ними получает 304."""
+        addresses = (
+            reverse('index'),
+            reverse('profile', kwargs={'username': self.user.username}),
+            reverse('post', kwargs={
+                'username': self.user.username, 'post_id': self.post.id
+            }),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                # отметки областей ставятся первым запросом
+                self.guest_client.get(address)
+                with mock.patch(CLOCK, return_value=time.time() + 2):
+                    response = self.guest_client.get(address)
+                    self.assertEqual(response.status_code, 200)
+                    response = self.guest_client.get(
+                        address, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+                    response = self.guest_client.get(
+                        address,
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                    )
+                    self.assertEqual(response.status_code, 304)
+
+    def test_last_modified_only_after_second_ends(self):
+        """Проверяет, что Last-Modified не отдаётся, пока не прошла
+        секунда отметки, и что изменение после ответа не даёт 304 по
+        If-Modified-Since."""
+        address = reverse('index')
+        self.guest_client.get(address)
+        stamp = scopes_last_modified([SITE_SCOPE, 'feed'])
+        with mock.patch(CLOCK, return_value=stamp):
+            response = self.guest_client.get(address)
+        self.assertFalse(response.has_header('Last-Modified'))
+        with mock.patch(CLOCK, return_value=math.ceil(stamp) + 1):
+            response = self.guest_client.get(address)
+            last_modified = response['Last-Modified']
+            self.assertEqual(last_modified, http_date(math.ceil(stamp)))
+            Post.objects.create(text='Свежий пост', author=self.user)
+            response = self.guest_client.get(
+                address, HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+        self.assertContains(response, 'Свежий пост')
+
+    def test_scope_stamps_expire(self):
+        """Проверяет, что отметка области из адреса запроса, даже
+        несуществующей, живёт ограниченное время."""
+        self.guest_client.get(
+            reverse('profile', kwargs={'username': 'no_such_user'})
+        )
+        key = 'lastmod:profile:no_such_user'
+        self.assertIsNotNone(cache.get(key))
+        later = time.time() + settings.SCOPE_STAMP_TIMEOUT + 1
+        with mock.patch(CLOCK, return_value=later):
+            self.assertIsNone(cache.get(key))
+
+    def test_changes_invalidate_page(self):
+        address = reverse('profile', kwargs={'username': self.user.username})
+        etag = self.guest_client.get(address)['ETag']
+        Post.objects.create(text='Свежий пост', author=self.user)
+        response = self.guest_client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Свежий пост')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_authorized_user_is_not_served_anonymous_page(self):
+        response = self.guest_client.get(reverse('index'))
+        response = self.authorized_client.get(
+            reverse('index'), HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новая')
+
+    def test_shared_page_fills_personal_fragments(self):
+        """Проверяет, что вошедшие пользователи получают общую копию
+        страницы, в которой личные фрагменты свои у каждого."""
+        other_user = User.objects.create_user(username='other_user')
+        other_client = Client()
+        other_client.force_login(other_user)
+        address = reverse('post', kwargs={
+            'username': self.user.username, 'post_id': self.post.id
+        })
+        edit_url = reverse('post_edit', kwargs={
+            'username': self.user.username, 'post_id': self.post.id
+        })
+        follow_url = reverse(
+            'profile_follow', kwargs={'username': self.user.username}
+        )
+        response = self.authorized_client.get(address)
+        self.assertContains(response, 'Пользователь: test_user')
+        self.assertContains(response, edit_url)
+        self.assertNotContains(response, follow_url)
+        # вторая страница отдаётся из общего кэша без шаблонов
+        response = other_client.get(address)
+        self.assertTemplateNotUsed(response, 'posts/post.html')
+        self.assertContains(response, 'Пользователь: other_user')
+        self.assertNotContains(response, 'Пользователь: test_user')
+        self.assertNotContains(response, edit_url)
+        self.assertContains(response, follow_url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, '<!--hole:')
+        other_client.get(follow_url)
+        response = other_client.get(address)
+        self.assertContains(response, 'Отписаться')
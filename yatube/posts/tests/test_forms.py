@@ -4,10 +4,12 @@ import tempfile
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.models import Post, Group, Comment
+from posts.storage import content_name
 
 User = get_user_model()
 
@@ -50,6 +52,7 @@ class PostFormTests(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -72,7 +75,7 @@ class PostFormTests(TestCase):
             Post.objects.filter(
                 text=form_data['text'],
                 group=form_data['group'],
-                image='posts/small.gif'
+                image=content_name('posts/small.gif', self.uploaded)
             ).exists()
         )
 
@@ -101,20 +104,22 @@ class PostFormTests(TestCase):
         # Проверяем, не изменилось ли число постов
         self.assertEqual(Post.objects.count(), post_count)
         # Проверяем, что пост изменился
-        response_post_view = self.authorized_client.get(
-            reverse(
-                'post',
-                kwargs={'username': self.post.author, 'post_id': self.post.id}
-            )
-        )
         self.assertEqual(
-            response_post_view.context['post'].text,
+            response_edit.context['post'].text,
             form_data['text']
         )
         self.assertEqual(
-            response_post_view.context['post'].group,
+            response_edit.context['post'].group,
             None
         )
+        # Повторный запрос отдаётся из кэша, уже с изменённым постом
+        response_post_view = self.authorized_client.get(
+            reverse(
+                'post',
+                kwargs={'username': self.post.author, 'post_id': self.post.id}
+            )
+        )
+        self.assertContains(response_post_view, form_data['text'])
 
     def test_login_user_create_comment(self):
         """Проверяет, что авторизированный пользователь может комментировать
@@ -139,6 +144,8 @@ class PostFormTests(TestCase):
             )
         )
         self.assertEqual(self.post.comments.count(), comment_count + 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, comment_count + 1)
         # Проверяем, что создался коммент с нужными полями
         self.assertTrue(
             Comment.objects.filter(
@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from posts.models import Post, Group
+from posts.models import Post, Group, Comment
 
 User = get_user_model()
 
@@ -42,6 +47,45 @@ class PostModelTest(TestCase):
         length_text_field = len(str(post))
         self.assertEqual(max_length_text_field, length_text_field)
 
+    def test_comment_count_follows_comments(self):
+        """Проверяет, что счётчик комментариев меняется при создании и
+        удалении комментариев и восстанавливается командой."""
+        post = PostModelTest.post
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        Comment.objects.create(post=post, author=self.user, text='Ещё один')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        Post.objects.filter(pk=post.pk).update(comment_count=10)
+        call_command('rebuild_comment_counts', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_post_delete_cost_independent_of_comments(self):
+        """Проверяет, что удаление поста не обновляет счётчик и кэш
+        поста на каждый удаляемый каскадом комментарий."""
+        queries = []
+        for comments in (1, 10):
+            post = Post.objects.create(text='Пост', author=self.user)
+            Comment.objects.bulk_create([
+                Comment(post=post, author=self.user, text='Комментарий')
+                for _ in range(comments)
+            ])
+            with CaptureQueriesContext(connection) as captured:
+                post.delete()
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+        comment = Comment.objects.create(
+            post=PostModelTest.post, author=self.user, text='Комментарий'
+        )
+        comment.delete()
+        PostModelTest.post.refresh_from_db()
+        self.assertEqual(PostModelTest.post.comment_count, 0)
+
 
 class GroupModelTest(TestCase):
     @classmethod
@@ -0,0 +1,122 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from posts.models import MediaFile, Post
+from posts.storage import content_storage, is_content_name
+from posts.tests.test_thumbnails import small_gif
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentStorageTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test_user')
+
+    def create(self, image):
+        return Post.objects.create(text='Пост', author=self.user, image=image)
+
+    def test_same_content_stored_once(self):
+        """Проверяет, что одинаковые картинки хранятся одним файлом в
+        подкаталогах по хэшу, а файл удаляется с последним постом."""
+        first = self.create(small_gif())
+        second = self.create(small_gif())
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(is_content_name(name))
+        directory, shard, subshard, filename = name.split('/')
+        self.assertEqual(directory, 'posts')
+        self.assertEqual(filename[:4], shard + subshard)
+        self.assertEqual(MediaFile.objects.get(name=name).refcount, 2)
+
+        first.delete()
+        self.assertTrue(content_storage.exists(name))
+        self.assertEqual(MediaFile.objects.get(name=name).refcount, 1)
+        second.delete()
+        self.assertFalse(content_storage.exists(name))
+        self.assertFalse(MediaFile.objects.exists())
+
+    def test_replaced_image_collected(self):
+        post = self.create(small_gif('first.gif'))
+        old_name = post.image.name
+        post.image = small_gif('second.gif')
+        post.save()
+        self.assertFalse(content_storage.exists(old_name))
+        self.assertTrue(content_storage.exists(post.image.name))
+        self.assertEqual(
+            list(MediaFile.objects.values_list('name', 'refcount')),
+            [(post.image.name, 1)]
+        )
+
+    def test_upload_of_same_content_survives_collect(self):
+        """Проверяет, что файл, найденный хранилищем для новой загрузки,
+        не удаляется вместе с последним старым постом."""
+        old = self.create(small_gif())
+        name = old.image.name
+        exists = content_storage.exists
+
+        def exists_then_delete_old(checked_name):
+            found = exists(checked_name)
+            if checked_name == name and Post.objects.filter(
+                    pk=old.pk).exists():
+                old.delete()
+            return found
+
+        with mock.patch.object(content_storage, 'exists',
+                               side_effect=exists_then_delete_old):
+            new = self.create(small_gif())
+        self.assertEqual(new.image.name, name)
+        self.assertTrue(content_storage.exists(name))
+        self.assertEqual(MediaFile.objects.get(name=name).refcount, 1)
+
+    def test_same_upload_on_edit_counted_once(self):
+        post = self.create(small_gif())
+        post.image = small_gif()
+        post.save()
+        self.assertEqual(MediaFile.objects.get().refcount, 1)
+
+    def test_migrate_media_storage(self):
+        """Проверяет перенос картинок, сохранённых под исходными именами."""
+        legacy_name = 'posts/legacy.gif'
+        upload = small_gif('legacy.gif')
+        with open(content_storage.path(legacy_name), 'wb') as legacy:
+            legacy.write(upload.read())
+        Post.objects.create(text='Старый', author=self.user,
+                            image=legacy_name)
+        post = self.create(small_gif())
+        call_command(
+            'migrate_media_storage', stdout=StringIO()
+        )
+        moved = Post.objects.get(text='Старый')
+        self.assertTrue(is_content_name(moved.image.name))
+        self.assertTrue(content_storage.exists(moved.image.name))
+        self.assertFalse(content_storage.exists(legacy_name))
+        self.assertEqual(
+            dict(MediaFile.objects.values_list('name', 'refcount')),
+            {moved.image.name: 1, post.image.name: 1}
+        )
+
+    def test_existing_file_not_rewritten(self):
+        name = content_storage.save('posts/a.txt', ContentFile(b'data'))
+        self.assertEqual(
+            content_storage.save('posts/b.txt', ContentFile(b'data')), name
+        )
+        self.assertEqual(len(content_storage.listdir(
+            name.rsplit('/', 1)[0])[1]), 1)
@@ -0,0 +1,245 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from posts import thumbnails
+from posts.models import ImageVariant, Post
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def small_gif(name='small.gif'):
+    # хранилище различает файлы по содержимому, поэтому в картинку
+    # дописывается комментарий GIF с её именем
+    comment = name.encode()
+    content = SMALL_GIF[:-1] + (
+        b'\x21\xFE' + bytes([len(comment)]) + comment + b'\x00\x3B'
+    )
+    return SimpleUploadedFile(
+        name=name, content=content, content_type='image/gif'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test_user')
+        self.post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=small_gif()
+        )
+
+    def test_thumbnail_name_matches_sorl(self):
+        """Проверяет, что имя миниатюры считается так же, как в sorl."""
+        thumbnail = get_thumbnail(
+            self.post.image, thumbnails.CARD_GEOMETRY,
+            **thumbnails.CARD_OPTIONS
+        )
+        self.assertEqual(
+            thumbnails.thumbnail_file(self.post.image.name).name,
+            thumbnail.name
+        )
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Проверяет, что до создания миниатюры страница показывает
+        заглушку и не создаёт миниатюру в запросе."""
+        url = reverse('post', kwargs={
+            'username': self.user.username, 'post_id': self.post.id
+        })
+        response = self.client.get(url)
+        self.assertContains(response, 'padding-top: 35.3%')
+        self.assertIsNone(thumbnails.cached_thumbnail(self.post.image.name))
+
+        thumbnails.generate(self.post.id, self.post.image.name)
+        thumbnail = thumbnails.cached_thumbnail(self.post.image.name)
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+        response = self.client.get(url)
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, 'padding-top: 35.3%')
+
+    def test_image_locked_while_queued(self):
+        """Проверяет, что картинка ставится в очередь один раз, пока
+        миниатюра не готова."""
+        lock = f'thumbnail-lock:{self.post.image.name}'
+        self.assertIsNotNone(cache.get(lock))
+        cache.delete(lock)
+        thumbnails.schedule(self.post)
+        self.assertIsNotNone(cache.get(lock))
+        thumbnails.generate(self.post.id, self.post.image.name)
+        self.assertIsNone(cache.get(lock))
+
+    def test_failed_image_not_rescheduled(self):
+        """Проверяет, что картинка, для которой создание миниатюр
+        упало, не ставится в очередь на каждый показ страницы."""
+        with mock.patch('posts.thumbnails.get_thumbnail',
+                        side_effect=OSError), \
+                self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails.generate(self.post.id, self.post.image.name)
+        url = reverse('post', kwargs={
+            'username': self.user.username, 'post_id': self.post.id
+        })
+        with mock.patch('posts.thumbnails._submit') as submit, \
+                mock.patch('posts.thumbnails.transaction.on_commit',
+                           side_effect=lambda callback: callback()):
+            for _ in range(2):
+                response = self.client.get(url)
+                self.assertContains(response, 'padding-top: 35.3%')
+        submit.assert_not_called()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailResolverTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test_user')
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=self.user,
+                image=small_gif(f'picture{number}.gif')
+            )
+            for number in range(3)
+        ]
+        self.posts.append(Post.objects.create(text='Без картинки',
+                                              author=self.user))
+        for post in self.posts[:2]:
+            thumbnails.generate(post.id, post.image.name)
+
+    def test_one_lookup_per_page(self):
+        """Проверяет, что миниатюры всей страницы читаются одним
+        обращением к кэшу, промахи — одним запросом к базе, а варианты
+        для srcset — ещё одним."""
+        posts = list(Post.objects.filter(
+            pk__in=[post.pk for post in self.posts]
+        ))
+        cache.clear()
+        with self.assertNumQueries(2):
+            thumbnails.resolve_thumbnails(posts)
+        with self.assertNumQueries(1):
+            thumbnails.resolve_thumbnails(posts)
+        resolved = {post.pk: post.card_thumbnail for post in posts}
+        for post in self.posts[:2]:
+            self.assertEqual(
+                resolved[post.pk].url,
+                thumbnails.cached_thumbnail(post.image.name).url
+            )
+        self.assertIsNone(resolved[self.posts[2].pk])
+        self.assertIsNone(resolved[self.posts[3].pk])
+
+    def test_feed_uses_resolved_thumbnails(self):
+        response = self.client.get(reverse('index'))
+        for post in response.context['page']:
+            with self.subTest(post=post.text):
+                self.assertTrue(hasattr(post, 'card_thumbnail'))
+        for post in self.posts[:2]:
+            self.assertContains(
+                response, thumbnails.cached_thumbnail(post.image.name).url
+            )
+        self.assertContains(response, 'padding-top: 35.3%', count=1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test_user')
+        self.post = Post.objects.create(
+            text='Пост', author=self.user, image=small_gif()
+        )
+        thumbnails.generate(self.post.id, self.post.image.name)
+
+    def test_variants_in_srcset(self):
+        """Проверяет, что для картинки созданы все ширины во всех
+        форматах и они попали в <picture>."""
+        variants = ImageVariant.objects.filter(post=self.post)
+        self.assertEqual(
+            set(variants.values_list('format', 'width', 'height')),
+            {(image_format, width, height)
+             for image_format in ('webp', 'jpeg')
+             for width, height in ((480, 170), (720, 254), (960, 339))}
+        )
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '<picture>')
+        webp = variants.filter(format='webp').order_by('width')
+        srcset = ', '.join(
+            f'{default_storage.url(variant.name)} {variant.width}w'
+            for variant in webp
+        )
+        self.assertContains(
+            response, f'type="image/webp" srcset="{srcset}"', html=False
+        )
+        # повторная генерация не создаёт дублей
+        thumbnails.generate(self.post.id, self.post.image.name)
+        self.assertEqual(variants.count(), 6)
+
+    def test_new_image_invalidates_variants(self):
+        """Проверяет, что замена картинки и удаление поста удаляют
+        варианты вместе с файлами."""
+        old_names = list(ImageVariant.objects.values_list('name', flat=True))
+        self.post.image = small_gif('other.gif')
+        self.post.save()
+        self.assertFalse(ImageVariant.objects.exists())
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name))
+        thumbnails.generate(self.post.id, self.post.image.name)
+        new_names = list(ImageVariant.objects.values_list('name', flat=True))
+        self.assertEqual(len(new_names), 6)
+        self.post.delete()
+        for name in new_names:
+            self.assertFalse(default_storage.exists(name))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailOnCommitTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_thumbnail_created_after_commit(self):
+        """Проверяет, что миниатюра создаётся после сохранения поста и
+        при замене картинки."""
+        user = User.objects.create_user(username='test_user')
+        post = Post.objects.create(
+            text='Пост', author=user, image=small_gif('first.gif')
+        )
+        self.assertIsNotNone(thumbnails.cached_thumbnail(post.image.name))
+        post.image = small_gif('second.gif')
+        post.save()
+        self.assertIsNotNone(thumbnails.cached_thumbnail(post.image.name))
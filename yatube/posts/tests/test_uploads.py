@@ -0,0 +1,127 @@
+import shutil
+import tempfile
+from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageFile
+from rest_framework.test import APIClient
+
+from posts.models import Post
+from posts.storage import content_name
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_file(name, size, image_format, exif=None, **options):
+    buffer = BytesIO()
+    if exif:
+        options['exif'] = exif
+    Image.new('RGB', size, 'red').save(buffer, image_format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0,
+                   IMAGE_MAX_SIDE=64)
+class UploadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test_user')
+        self.client.force_login(self.user)
+
+    def create(self, image):
+        return self.client.post(
+            reverse('new_post'), {'text': 'Пост', 'image': image}
+        )
+
+    def test_small_image_stored_as_is(self):
+        """Проверяет, что подходящая картинка сохраняется без
+        перекодирования."""
+        upload = image_file('small.png', (40, 20), 'PNG')
+        self.create(upload)
+        post = Post.objects.get()
+        self.assertEqual(post.image.name,
+                         content_name('posts/small.png', upload))
+        with post.image.open() as stored:
+            self.assertEqual(stored.read(), upload.file.getvalue())
+
+    def test_large_image_normalized(self):
+        """Проверяет, что большая картинка уменьшается, поворачивается
+        по EXIF и теряет метаданные."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # повернуть на 90° по часовой
+        exif[0x010F] = 'Камера'
+        self.create(image_file('photo.jpg', (200, 100), 'JPEG', exif))
+        post = Post.objects.get()
+        with Image.open(post.image) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.size, (32, 64))
+            self.assertEqual(len(stored.getexif()), 0)
+
+    def test_large_mpo_saved_as_jpeg(self):
+        """Проверяет, что снимок MPO с камеры сохраняется как JPEG."""
+        second = Image.new('RGB', (200, 100), 'blue')
+        self.create(image_file('photo.jpg', (200, 100), 'MPO',
+                               save_all=True, append_images=[second]))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.size, (64, 32))
+
+    @override_settings(UPLOAD_MAX_SIZE=1024)
+    def test_rest_of_too_large_file_not_read(self):
+        """Проверяет, что разбор запроса останавливается на первом
+        лишнем куске файла, а сам файл отклоняется по размеру."""
+        request = RequestFactory().post('/', {
+            'image': image_file('big.bmp', (300, 300), 'BMP'),
+            'text': 'Пост',
+        })
+        self.assertGreater(request.FILES['image'].size, 1024)
+        self.assertNotIn('text', request.POST)
+        self.assertGreater(request._stream.remaining, 0)
+
+    @override_settings(UPLOAD_MAX_SIZE=1024)
+    def test_too_large_file_rejected(self):
+        response = self.create(image_file('big.bmp', (100, 100), 'BMP'))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 1,0\xa0КБ.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected_before_decoding(self):
+        """Проверяет, что картинка с большими размерами в заголовке
+        отклоняется без декодирования пикселей."""
+        with mock.patch.object(ImageFile.ImageFile, 'load',
+                               side_effect=AssertionError):
+            response = self.create(image_file('wide.png', (20, 10), 'PNG'))
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка 20×10 слишком велика.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(UPLOAD_MAX_SIZE=1024)
+    def test_api_rejects_too_large_file(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(
+            '/api/v1/posts/',
+            {'text': 'Пост', 'image': image_file('big.bmp', (100, 100),
+                                                 'BMP')},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(response.data['image'], ['Файл больше 1,0\xa0КБ.'])
+        self.assertFalse(Post.objects.exists())
@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase, Client
 
 from posts.models import Post, Group
@@ -8,6 +9,8 @@ from posts.models import Post, Group
 User = get_user_model()
 
 
+# кэш страниц очищается в setUp: ответ из кэша приходит без списка
+# использованных шаблонов
 class PostURLTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -26,6 +29,7 @@ class PostURLTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -104,6 +108,7 @@ class PostURLTests(TestCase):
             'posts/index.html': '/',
             'posts/group.html': f'/group/{self.group.slug}/',
             'posts/profile.html': f'/{self.user.username}/',
+            'posts/follows.html': f'/{self.user.username}/followers/',
             'posts/post.html': f'/{self.user.username}/{self.post.id}/',
             'posts/new_post.html': '/new/',
             'posts/post_edit.html': (
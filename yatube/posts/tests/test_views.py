@@ -1,18 +1,25 @@
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from posts.models import Post, Group, Follow
+from posts import follows
+from posts.models import AuthorStats, Post, Group, Follow
 
 User = get_user_model()
 
 
+# кэш страниц очищается в setUp: ответ из кэша приходит без контекста
+# шаблона
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -63,6 +70,7 @@ class PostPagesTests(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -135,6 +143,8 @@ class PostPagesTests(TestCase):
                 self.assertEqual(post_image_0, self.post.image)
 
         with self.subTest('group context "group" page'):
+            # страница группы уже в общем кэше после запросов выше
+            cache.clear()
             response = self.authorized_client.get(
                 reverse('group_posts', kwargs={'slug': self.group.slug})
             )
@@ -198,6 +208,8 @@ class PostPagesTests(TestCase):
             self.assertTrue(
                 response.context['following']
             )
+            self.assertEqual(response.context['stats'].followers, 1)
+            self.assertEqual(response.context['stats'].posts, 1)
 
     def test_new_post_page_shows_correct_context(self):
         """Функция проверяет словарь контекста страниц создания нового поста
@@ -264,6 +276,102 @@ class PostPagesTests(TestCase):
         response = self.authorized_client_3.get(reverse('follow_index'))
         self.assertEqual(len(response.context['page']), 0)
 
+    def test_timeline_fan_out_and_unfollow(self):
+        """Проверяет, что новый пост раскладывается по лентам подписчиков,
+        а после отписки посты автора пропадают из ленты."""
+        self.authorized_client_2 = Client()
+        self.authorized_client_2.force_login(self.user_2)
+        self.authorized_client_2.get(reverse(
+            'profile_follow', kwargs={'username': self.user.username})
+        )
+        self.authorized_client.post(
+            reverse('new_post'), data={'text': 'Пост для ленты подписчика'}
+        )
+        response = self.authorized_client_2.get(reverse('follow_index'))
+        self.assertEqual(len(response.context['page']), 2)
+        self.assertEqual(
+            response.context['page'][0].text, 'Пост для ленты подписчика'
+        )
+        self.authorized_client_2.get(reverse(
+            'profile_unfollow', kwargs={'username': self.user.username})
+        )
+        response = self.authorized_client_2.get(reverse('follow_index'))
+        self.assertEqual(len(response.context['page']), 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_timeline_merge_on_read_for_popular_author(self):
+        """Проверяет, что посты автора без fan-out подмешиваются при
+        чтении ленты."""
+        self.authorized_client_2 = Client()
+        self.authorized_client_2.force_login(self.user_2)
+        Follow.objects.create(user=self.user_2, author=self.user)
+        self.assertFalse(self.user_2.timeline.exists())
+        response = self.authorized_client_2.get(reverse('follow_index'))
+        self.assertEqual(len(response.context['page']), 1)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_timeline_keeps_posts_when_author_leaves_pull_mode(self):
+        """Проверяет, что посты, опубликованные автором в режиме чтения,
+        остаются в лентах после того, как подписчиков стало меньше."""
+        self.authorized_client_2 = Client()
+        self.authorized_client_2.force_login(self.user_2)
+        Follow.objects.create(user=self.user_2, author=self.user)
+        follow = Follow.objects.create(user=self.user_3, author=self.user)
+        self.assertTrue(AuthorStats.objects.get(user=self.user).pulled)
+        post = Post.objects.create(text='Пост популярного автора',
+                                   author=self.user)
+        self.assertFalse(self.user_2.timeline.filter(post=post).exists())
+
+        follow.delete()
+        self.assertFalse(AuthorStats.objects.get(user=self.user).pulled)
+        self.assertTrue(self.user_2.timeline.filter(post=post).exists())
+        response = self.authorized_client_2.get(reverse('follow_index'))
+        self.assertEqual(len(response.context['page']), 2)
+        self.assertEqual(response.context['page'][0], post)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1, PAGE_SIZE=2)
+    def test_timeline_merges_stored_and_pulled_posts(self):
+        """Проверяет, что лента сливает записи из таблицы лент и посты
+        авторов в режиме чтения по дате без повторов — и по номерам
+        страниц, и по курсору."""
+        client = Client()
+        client.force_login(self.user_2)
+        Follow.objects.create(user=self.user_2, author=self.user)
+        Follow.objects.create(user=self.user_2, author=self.user_3)
+        Follow.objects.create(user=self.user, author=self.user_3)
+        self.assertTrue(AuthorStats.objects.get(user=self.user_3).pulled)
+        for number in range(5):
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=self.user if number % 2 else self.user_3
+            )
+        expected = list(Post.objects.filter(
+            author__in=[self.user, self.user_3]
+        ).order_by('-pub_date', '-id'))
+        self.assertFalse(self.user_2.timeline.filter(
+            post__author=self.user_3
+        ).exists())
+
+        numbered = []
+        for number in range(1, 4):
+            page = client.get(
+                reverse('follow_index'), {'page': number}
+            ).context['page']
+            self.assertEqual(page.paginator.count, len(expected))
+            numbered += page
+        self.assertEqual(numbered, expected)
+
+        cursored = []
+        params = {}
+        with self.settings(CURSOR_PAGINATION=True):
+            while params.get('before', '') is not None:
+                page = client.get(
+                    reverse('follow_index'), params
+                ).context['page']
+                cursored += page
+                params['before'] = page.next_cursor()
+        self.assertEqual(cursored, expected)
+
     def test_login_user_follow(self):
         """Проверяет, что авторизованный пользователь может подписываться на
         других пользователей."""
@@ -285,7 +393,69 @@ class PostPagesTests(TestCase):
             Follow.objects.filter(user=self.user, author=self.user_2).exists()
         )
 
+    def test_repeated_follow_is_idempotent(self):
+        """Проверяет, что повторная подписка и отписка ничего не ломают
+        и не меняют счётчики дважды."""
+        url = reverse('profile_follow',
+                      kwargs={'username': self.user_2.username})
+        for _ in range(2):
+            self.authorized_client.get(url)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user_2).followers, 1
+        )
+        url = reverse('profile_unfollow',
+                      kwargs={'username': self.user_2.username})
+        for _ in range(2):
+            self.authorized_client.get(url)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user_2).followers, 0
+        )
+        self.authorized_client.get(reverse(
+            'profile_follow', kwargs={'username': self.user.username}
+        ))
+        self.assertFalse(self.user.follower.exists())
+
+    def test_concurrent_follow_not_counted_twice(self):
+        """Проверяет, что подписка, созданная параллельным запросом между
+        проверкой и вставкой, не меняет счётчики ещё раз."""
+        Follow.objects.create(user=self.user, author=self.user_2)
+        # проверка существующих подписок «не успела» увидеть новую
+        with mock.patch('posts.follows._existing_follows',
+                        return_value=set()):
+            created = follows.follow_authors(self.user, [self.user_2.pk])
+        self.assertEqual(created, set())
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user_2).followers, 1
+        )
+        self.assertEqual(AuthorStats.objects.get(user=self.user).following, 1)
+
+    def test_author_stats_follow_changes(self):
+        """Проверяет, что счётчики карточки автора меняются при подписке,
+        отписке и публикации, а команда сверки исправляет расхождения."""
+        self.authorized_client.get(reverse(
+            'profile_follow', kwargs={'username': self.user_2.username})
+        )
+        self.assertEqual(self.user_2.stats.followers, 1)
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.following, 1)
+        self.authorized_client.post(
+            reverse('new_post'), data={'text': 'Ещё один пост'}
+        )
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.posts, 2)
+        self.authorized_client.get(reverse(
+            'profile_unfollow', kwargs={'username': self.user_2.username})
+        )
+        self.user_2.stats.refresh_from_db()
+        self.assertEqual(self.user_2.stats.followers, 0)
+        AuthorStats.objects.filter(pk=self.user.pk).update(posts=100)
+        call_command('reconcile_author_stats', stdout=StringIO())
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.posts, 2)
+
 
+# кэш страниц очищается в setUp: ответ из кэша приходит без контекста
+# шаблона
 class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -305,6 +475,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -341,3 +512,196 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(
                     len(response.context.get('page').object_list), 3
                 )
+
+
+@override_settings(CURSOR_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовое имя сообщества',
+            slug='test-slug',
+            description='Тестовое описание сообщества'
+        )
+        # создаем 13 постов, часть из них с одинаковой датой публикации
+        cls.posts = [
+            Post.objects.create(
+                text=f'Тестовый текст поста {i}',
+                author=cls.user,
+                group=cls.group
+            )
+            for i in range(13)
+        ]
+        Post.objects.filter(pk__in=[post.pk for post in cls.posts[5:]]).update(
+            pub_date=cls.posts[5].pub_date
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Функция проверяет, что по курсорам before/after страницы
+        главной, группы и профиля проходятся без пропусков и повторов."""
+        address_kwargs = {
+            'index': {},
+            'group_posts': {'slug': self.group.slug},
+            'profile': {'username': self.user.username},
+        }
+        for address, kwargs in address_kwargs.items():
+            with self.subTest(address=address):
+                url = reverse(address, kwargs=kwargs)
+                first = self.authorized_client.get(url).context['page']
+                self.assertEqual(len(first), 10)
+                self.assertFalse(first.has_previous())
+                second = self.authorized_client.get(
+                    url, {'before': first.next_cursor()}
+                ).context['page']
+                self.assertEqual(len(second), 3)
+                self.assertFalse(second.has_next())
+                seen = [post.id for post in first]
+                seen += [post.id for post in second]
+                self.assertEqual(
+                    sorted(seen), sorted(post.id for post in self.posts)
+                )
+                back = self.authorized_client.get(
+                    url, {'after': second.previous_cursor()}
+                ).context['page']
+                self.assertEqual(
+                    [post.id for post in back], [post.id for post in first]
+                )
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.authorized_client.get(
+            reverse('index'), {'before': 'broken'}
+        )
+        self.assertEqual(len(response.context['page']), 10)
+
+
+class FollowListViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{i:02}')
+            for i in range(12)
+        ]
+        for reader in cls.readers:
+            Follow.objects.create(user=reader, author=cls.author)
+
+    def test_followers_and_following_pages(self):
+        """Функция проверяет страницы подписчиков и подписок: новые
+        сначала, курсор по подписке, поиск по началу имени."""
+        url = reverse('followers', kwargs={'username': 'author'})
+        first = self.client.get(url).context['page']
+        self.assertEqual(
+            [follow.person.username for follow in first][:2],
+            ['reader11', 'reader10']
+        )
+        second = self.client.get(
+            url, {'before': first.next_cursor()}
+        ).context['page']
+        self.assertEqual(
+            [follow.person.username for follow in second],
+            ['reader01', 'reader00']
+        )
+        response = self.client.get(url, {'prefix': 'reader'})
+        self.assertEqual(len(response.context['page']), 10)
+        self.assertContains(response, '?prefix=reader&amp;before=')
+        response = self.client.get(url, {'prefix': 'reader1'})
+        self.assertEqual(len(response.context['page']), 2)
+        # знаки шаблона LIKE ищутся как обычные символы
+        response = self.client.get(url, {'prefix': 'reader_'})
+        self.assertEqual(len(response.context['page']), 0)
+        following = self.client.get(
+            reverse('following', kwargs={'username': 'reader03'})
+        ).context['page']
+        self.assertEqual(
+            [follow.person.username for follow in following], ['author']
+        )
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='pushkin',
+            first_name='Александр',
+            last_name='Пушкин'
+        )
+        cls.other = User.objects.create_user(username='lermontov')
+        cls.post = Post.objects.create(
+            text='Мороз и солнце; день чудесный! Мороз крепчал.',
+            author=cls.user
+        )
+        cls.other_post = Post.objects.create(
+            text='Белеет парус одинокой в тумане моря голубом',
+            author=cls.other
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def search(self, query):
+        response = self.guest_client.get(
+            reverse('search_user'), {'search': query}
+        )
+        posts = list(response.context['page'])
+        return response.context['find_user'], posts
+
+    def test_search_ignores_cyrillic_case(self):
+        """Проверяет, что кириллица ищется без учета регистра."""
+        users, posts = self.search('МОРОЗ Солн')
+        self.assertEqual(posts, [self.post])
+        users, posts = self.search('александр')
+        self.assertEqual(users, [self.user])
+
+    def test_search_does_not_resolve_images(self):
+        """Проверяет, что страница поиска без картинок не ищет их
+        миниатюры и варианты."""
+        with mock.patch('posts.views.resolve_thumbnails') as resolve:
+            _, posts = self.search('мороз')
+        self.assertEqual(posts, [self.post])
+        resolve.assert_not_called()
+
+    def test_search_requires_all_words(self):
+        _, posts = self.search('мороз парус')
+        self.assertEqual(posts, [])
+
+    def test_search_index_follows_post_changes(self):
+        """Проверяет, что индекс обновляется при правке и удалении поста."""
+        self.other_post.text = 'Парус мороз'
+        self.other_post.save()
+        _, posts = self.search('мороз')
+        # у первого поста слово встречается дважды, он выше
+        self.assertEqual(posts, [self.post, self.other_post])
+        self.post.delete()
+        cache.clear()
+        _, posts = self.search('мороз')
+        self.assertEqual(posts, [self.other_post])
+
+    @override_settings(SEARCH_RESULTS_LIMIT=12)
+    def test_search_results_are_paginated_and_capped(self):
+        """Проверяет, что результаты поиска ограничены и разбиты на
+        страницы, а повторный запрос обслуживается из кэша."""
+        for number in range(15):
+            Post.objects.create(
+                text=f'Мороз номер {number}', author=self.other
+            )
+        response = self.guest_client.get(
+            reverse('search_user'), {'search': 'Мороз'}
+        )
+        self.assertEqual(len(response.context['page']), 10)
+        self.assertEqual(response.context['page'].paginator.count, 12)
+        Post.objects.create(text='Мороз новый', author=self.other)
+        response = self.guest_client.get(
+            reverse('search_user'), {'search': '  мороз ', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page']), 2)
+        self.assertContains(response, 'search=')
@@ -0,0 +1,254 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connections, transaction
+from django.dispatch import Signal
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from .models import ImageVariant, Post
+from .storage import content_storage
+
+logger = logging.getLogger(__name__)
+
+# миниатюра в карточке поста
+CARD_GEOMETRY = '960x339'
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+CARD_WIDTH, CARD_HEIGHT = 960, 339
+
+# миниатюра поста готова: кэш страниц с заглушкой нужно сбросить
+thumbnail_ready = Signal()
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def source_file(image_name):
+    """Картинка поста как исходник sorl: в хранилище по содержимому."""
+    return ImageFile(image_name, content_storage)
+
+
+def thumbnail_file(image_name, geometry=CARD_GEOMETRY, options=None):
+    """
+    ImageFile миниатюры с тем же именем, которое дал бы get_thumbnail,
+    но без чтения исходника и без генерации. Публичного способа узнать
+    имя у sorl нет, поэтому здесь повторяется его backend.get_thumbnail
+    с закрытыми _get_format и _get_thumbnail_filename: версия sorl
+    зафиксирована в requirements.txt, а совпадение имён проверяет
+    test_thumbnail_name_matches_sorl.
+    """
+    options = dict(CARD_OPTIONS if options is None else options)
+    source = source_file(image_name)
+    backend = default.backend
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def cached_thumbnail(image_name):
+    """Готовая миниатюра карточки из хранилища sorl или None."""
+    if not image_name:
+        return None
+    return default.kvstore.get(thumbnail_file(image_name))
+
+
+def resolve_thumbnails(posts):
+    """
+    Проставляет постам страницы card_thumbnail — готовую миниатюру или
+    None. Записи хранилища sorl читаются одним get_many из кэша, а
+    промахи — одним запросом к таблице KVStore, вместо поиска на каждый
+    тег в шаблоне. Промахи кэшируются так же, как это делает sorl.
+    """
+    keys = {
+        post.pk: add_prefix(thumbnail_file(post.image.name).key)
+        for post in posts if post.image
+    }
+    kv_cache = getattr(default.kvstore, 'cache', None)
+    if kv_cache is None:
+        # другие хранилища sorl не умеют читать пачкой
+        for post in posts:
+            post.card_thumbnail = cached_thumbnail(
+                post.image.name if post.image else ''
+            )
+        return attach_image_sources(posts)
+    values = kv_cache.get_many(keys.values()) if keys else {}
+    missing = [key for key in keys.values() if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(key__in=missing).values_list(
+            'key', 'value'
+        ))
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kv_cache.set_many(fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    for post in posts:
+        value = values.get(keys.get(post.pk))
+        post.card_thumbnail = (
+            deserialize_image_file(value)
+            if value and value != EMPTY_VALUE else None
+        )
+    return attach_image_sources(posts)
+
+
+def attach_image_sources(posts):
+    """
+    Проставляет постам image_sources — список {'format', 'srcset'} для
+    тегов <source> в порядке IMAGE_VARIANT_FORMATS. Варианты всей
+    страницы читаются одним запросом.
+    """
+    sources = {post.pk: post.image.name for post in posts if post.image}
+    variants = {}
+    if sources:
+        for variant in ImageVariant.objects.filter(post_id__in=sources):
+            if variant.source == sources[variant.post_id]:
+                variants.setdefault(variant.post_id, []).append(variant)
+    for post in posts:
+        by_format = {}
+        for variant in sorted(variants.get(post.pk, ()),
+                              key=lambda variant: variant.width):
+            by_format.setdefault(variant.format, []).append(
+                f'{default.storage.url(variant.name)} {variant.width}w'
+            )
+        post.image_sources = [
+            {'format': image_format,
+             'srcset': ', '.join(by_format[image_format])}
+            for image_format in settings.IMAGE_VARIANT_FORMATS
+            if image_format in by_format
+        ]
+    return posts
+
+
+def _lock_key(image_name):
+    return f'thumbnail-lock:{image_name}'
+
+
+def variant_geometry(width):
+    """Размер варианта той же пропорции, что и миниатюра карточки."""
+    return width, round(width * CARD_HEIGHT / CARD_WIDTH)
+
+
+def generate_variants(post_id, image_name):
+    """
+    Создаёт недостающие варианты картинки для srcset: каждую ширину из
+    IMAGE_VARIANT_WIDTHS в каждом формате из IMAGE_VARIANT_FORMATS.
+    Ничего не делает, если пост удалён или картинку уже заменили.
+    """
+    if not Post.objects.filter(pk=post_id, image=image_name).exists():
+        return
+    existing = set(ImageVariant.objects.filter(
+        post_id=post_id, source=image_name
+    ).values_list('format', 'width'))
+    variants = []
+    for image_format in settings.IMAGE_VARIANT_FORMATS:
+        for width in settings.IMAGE_VARIANT_WIDTHS:
+            if (image_format, width) in existing:
+                continue
+            width, height = variant_geometry(width)
+            thumbnail = get_thumbnail(
+                source_file(image_name), f'{width}x{height}',
+                format=image_format.upper(), **CARD_OPTIONS
+            )
+            variants.append(ImageVariant(
+                post_id=post_id, source=image_name, format=image_format,
+                width=width, height=height, name=thumbnail.name,
+            ))
+    ImageVariant.objects.bulk_create(variants, ignore_conflicts=True)
+
+
+def forget_variants(post):
+    """Удаляет варианты прежних картинок поста вместе с файлами."""
+    variants = ImageVariant.objects.filter(post=post)
+    if post.image:
+        variants = variants.exclude(source=post.image.name)
+    # файлы удаляет обработчик post_delete
+    variants.delete()
+
+
+def delete_variant_file(variant):
+    # одинаковые картинки хранятся одним файлом, и варианты у постов
+    # с такими картинками общие
+    if ImageVariant.objects.filter(name=variant.name).exists():
+        return
+    thumbnail = ImageFile(variant.name, default.storage)
+    default.kvstore.delete(thumbnail, delete_thumbnails=False)
+    thumbnail.delete()
+
+
+def forget_image(image_name):
+    """Удаляет все миниатюры картинки и её запись в хранилище sorl."""
+    delete(source_file(image_name), delete_file=False)
+
+
+def generate(post_id, image_name):
+    """
+    Создаёт миниатюру карточки и варианты для srcset. Блокировка по
+    картинке ставится при постановке в очередь (schedule) и снимается
+    здесь. После ошибки блокировка остаётся на THUMBNAIL_RETRY_TIMEOUT:
+    битая картинка не ставится в очередь на каждый показ страницы.
+    """
+    try:
+        get_thumbnail(
+            source_file(image_name), CARD_GEOMETRY, **CARD_OPTIONS
+        )
+        generate_variants(post_id, image_name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', image_name)
+        cache.set(_lock_key(image_name), 'failed',
+                  settings.THUMBNAIL_RETRY_TIMEOUT)
+    else:
+        cache.delete(_lock_key(image_name))
+        thumbnail_ready.send(sender=None, post_id=post_id)
+
+
+def _generate_in_worker(post_id, image_name):
+    close_old_connections()
+    try:
+        generate(post_id, image_name)
+    finally:
+        # у потока пула своё соединение с базой, его нужно закрыть самим
+        connections.close_all()
+
+
+def _submit(post_id, image_name):
+    if settings.THUMBNAIL_WORKERS:
+        _get_executor().submit(_generate_in_worker, post_id, image_name)
+    else:
+        generate(post_id, image_name)
+
+
+def schedule(post):
+    """
+    Ставит создание миниатюры поста в очередь пула после коммита. Пока
+    картинка в очереди или в работе, повторные вызовы ничего не делают,
+    поэтому популярный пост не создаёт миниатюру несколько раз.
+    """
+    image_name = post.image.name if post.image else ''
+    if not image_name:
+        return
+    if not cache.add(_lock_key(image_name), True,
+                     settings.THUMBNAIL_LOCK_TIMEOUT):
+        return
+    post_id = post.pk
+    transaction.on_commit(lambda: _submit(post_id, image_name))
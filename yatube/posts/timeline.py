@@ -0,0 +1,158 @@
+import heapq
+
+from django.conf import settings
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .pagination import seek
+
+
+def _is_fanned_out(author_id):
+    """
+    Посты авторов с большим числом подписчиков не раскладываются по лентам,
+    а подмешиваются при чтении (merge on read). Режим автора хранится в
+    AuthorStats.pulled и меняется только в sync_fanout.
+    """
+    return not AuthorStats.objects.filter(pk=author_id, pulled=True).exists()
+
+
+def sync_fanout(author_id):
+    """
+    Переключает режим автора, когда число подписчиков переходит через
+    TIMELINE_FANOUT_LIMIT. При возврате к fan-out ленты всех подписчиков
+    заполняются постами, которые они получали при чтении. Условный
+    UPDATE гарантирует, что переход выполнит только один запрос. При
+    переходе к чтению записи автора из лент удаляются: его посты
+    подмешивает Timeline, и в лентах они бы повторились.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    stats = AuthorStats.objects.filter(pk=author_id)
+    if stats.filter(pulled=False, followers__gt=limit).update(pulled=True):
+        TimelineEntry.objects.filter(post__author_id=author_id).delete()
+        return
+    if stats.filter(pulled=True, followers__lte=limit).update(pulled=False):
+        followers = Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        )
+        for user_id in followers.iterator():
+            _fill(user_id, author_id)
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if not _is_fanned_out(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers],
+        ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту свежими постами автора после подписки."""
+    if _is_fanned_out(author_id):
+        _fill(user_id, author_id)
+
+
+def _fill(user_id, author_id):
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts],
+        ignore_conflicts=True
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+class Timeline:
+    """
+    Лента подписок для Paginator и CursorPaginator. Материализованные
+    записи читаются по индексу (user, -pub_date, -post), посты авторов,
+    для которых fan-out не выполняется, — по индексу (author, -pub_date,
+    -id), каждый источник с LIMIT. Отсортированные окна сливаются по
+    (pub_date, id), и только посты итогового окна читаются целиком.
+    """
+    model = Post
+    ordered = True
+
+    def __init__(self, user):
+        self.user = user
+        self._pulled = None
+
+    def pulled_authors(self):
+        if self._pulled is None:
+            self._pulled = list(AuthorStats.objects.filter(
+                pk__in=Follow.objects.filter(user=self.user).values('author'),
+                pulled=True
+            ).values_list('pk', flat=True))
+        return self._pulled
+
+    def count(self):
+        total = TimelineEntry.objects.filter(user=self.user).count()
+        pulled = self.pulled_authors()
+        if pulled:
+            total += Post.objects.filter(author_id__in=pulled).count()
+        return total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.window(None, 'lt', index.stop)[index.start or 0:]
+        return self.window(None, 'lt', index + 1)[index]
+
+    def window(self, values, lookup, limit):
+        """
+        Первые limit постов за ключами values = (pub_date, id): по
+        возрастанию для lookup='gt', по убыванию для 'lt'.
+        """
+        descending = lookup == 'lt'
+        sources = [self._keys(
+            TimelineEntry.objects.filter(user=self.user),
+            ('pub_date', 'post_id'), values, lookup, limit
+        )]
+        for author_id in self.pulled_authors():
+            sources.append(self._keys(
+                Post.objects.filter(author_id=author_id),
+                ('pub_date', 'id'), values, lookup, limit
+            ))
+        # пост, попавший в ленту до перехода автора к чтению, может
+        # прийти из обоих источников: dict сохраняет порядок без повторов
+        ids = {}
+        for _, pk in heapq.merge(*sources, reverse=descending):
+            ids[pk] = None
+            if len(ids) == limit:
+                break
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            list(ids)
+        )
+        return [posts[pk] for pk in ids if pk in posts]
+
+    @staticmethod
+    def _keys(queryset, keys, values, lookup, limit):
+        if values:
+            queryset = queryset.filter(seek(keys, values, lookup))
+        if lookup == 'lt':
+            ordering = [f'-{key}' for key in keys]
+        else:
+            ordering = keys
+        return list(queryset.order_by(*ordering).values_list(*keys)[:limit])
+
+
+def rebuild():
+    """Полностью пересобирает материализованные ленты."""
+    TimelineEntry.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
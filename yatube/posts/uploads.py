@@ -0,0 +1,139 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.core.files.uploadhandler import (
+    StopUpload, TemporaryFileUploadHandler,
+)
+from django.http.multipartparser import MultiPartParser
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+TOO_LARGE_ERROR = 'Файл больше {limit}.'
+TOO_MANY_PIXELS_ERROR = 'Картинка {width}×{height} слишком велика.'
+
+# форматы, в которых картинка сохраняется как есть; остальное — в PNG
+SAVE_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+# форматы, которые Pillow распознаёт отдельно, а сохранять их надо как
+# другой: MPO — это JPEG с дополнительными кадрами
+SAVE_AS = {'MPO': 'JPEG'}
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загрузку во временный файл по частям, но не больше
+    UPLOAD_MAX_SIZE байт: на первом лишнем куске разбор запроса
+    прекращается, а остаток тела не читается — сервер закроет соединение
+    после ответа. Поля, шедшие после такого файла, теряются, а вместо
+    него в FILES попадает пустой файл с размером больше предела, по
+    которому форма и отклоняет загрузку.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.parsing = False
+        self.rejected = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if self.parsing:
+            return None
+        # разбирает тело сам, чтобы дописать в FILES отклонённый файл:
+        # после StopUpload парсер его уже не добавит
+        self.parsing = True
+        post, files = MultiPartParser(
+            META, input_data, self.request.upload_handlers, encoding
+        ).parse()
+        if self.rejected is not None:
+            files.appendlist(self.field_name, self.rejected)
+        return post, files
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_SIZE:
+            self.rejected = UploadedFile(
+                name=self.file_name, content_type=self.content_type,
+                size=self.received, charset=self.charset
+            )
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def check_upload(file):
+    """
+    Отклоняет файл больше UPLOAD_MAX_SIZE и картинку больше
+    IMAGE_UPLOAD_MAX_PIXELS. Размеры берутся из заголовка: Image.open
+    не декодирует пиксели.
+    """
+    if file.size > settings.UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            TOO_LARGE_ERROR.format(
+                limit=filesizeformat(settings.UPLOAD_MAX_SIZE)
+            ),
+            code='file_too_large'
+        )
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        width = height = None
+    except Exception:
+        # не картинка — это сообщит ImageField
+        return
+    finally:
+        file.seek(0)
+    if width is None or width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            TOO_MANY_PIXELS_ERROR.format(width=width or '?',
+                                         height=height or '?'),
+            code='image_too_large'
+        )
+
+
+def normalize_image(file):
+    """
+    Приводит картинку к хранимому виду: не больше IMAGE_MAX_SIDE по
+    большей стороне, поворот по EXIF применён, сами метаданные EXIF
+    удалены. Картинку, которой это не нужно, возвращает без перекодирования.
+    """
+    max_side = settings.IMAGE_MAX_SIDE
+    file.seek(0)
+    image = Image.open(file)
+    if max(image.size) <= max_side and not image.getexif():
+        file.seek(0)
+        return file
+    image_format = SAVE_AS.get(image.format, image.format)
+    if image_format == 'JPEG':
+        # декодер JPEG сразу уменьшает картинку в 2–8 раз
+        image.draft(image.mode, (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    name = file.name
+    if image_format not in SAVE_FORMATS:
+        image_format = 'PNG'
+        name = f'{os.path.splitext(name)[0]}.png'
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(
+        buffer, image_format,
+        icc_profile=image.info.get('icc_profile'),
+        **SAVE_OPTIONS.get(image_format, {})
+    )
+    normalized = SimpleUploadedFile(
+        name, buffer.getvalue(), content_type=Image.MIME[image_format]
+    )
+    normalized.image = image
+    return normalized
@@ -21,6 +21,18 @@ urlpatterns = [
     path('group/groups/', views.groups_index, name='groups_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
     path('<str:username>/', views.profile, name='profile'),
+    path(
+        '<str:username>/followers/',
+        views.follows,
+        {'kind': 'followers'},
+        name='followers'
+    ),
+    path(
+        '<str:username>/following/',
+        views.follows,
+        {'kind': 'following'},
+        name='following'
+    ),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path(
         '<str:username>/<int:post_id>/edit/',
@@ -1,22 +1,32 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
 
 from yatube.settings import PAGE_SIZE
-from .forms import PostForm, CommentForm, SearchUserForm
+from .caching import feed_cache_context, page_cache
+from .counters import get_author_stats
+from .follows import follow_list, update_follows, with_person
+from .forms import PostForm, CommentForm, SearchUserForm, UsernamePrefixForm
 from .models import Group, Post, Follow
+from .pagination import get_cursor_page, get_page
+from .search import cached_search, posts_by_ids, users_by_ids
+from .thumbnails import resolve_thumbnails
+from .timeline import Timeline
 
 User = get_user_model()
 
 
+@page_cache('feed')
 def index(request):
     post_list = Post.objects.select_related('author', 'group').all()
-    paginator = Paginator(post_list, PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = resolve_thumbnails(get_page(request, post_list))
     context = {
         'page': page,
+        **feed_cache_context(request, page),
     }
     return render(request, 'posts/index.html', context)
 
@@ -24,11 +34,8 @@ def index(request):
 @login_required
 def follow_index(request):
     user = request.user
-    post_list = Post.objects.select_related(
-        'author', 'group').filter(author__following__user=user)
-    paginator = Paginator(post_list, PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Timeline(user)
+    page = resolve_thumbnails(get_page(request, post_list))
     context = {
         'page': page
     }
@@ -37,18 +44,15 @@ def follow_index(request):
 
 @login_required
 def profile_follow(request, username):
-    user = request.user
     author = get_object_or_404(User, username=username)
-    if user != author:
-        Follow.objects.get_or_create(user=user, author=author)
+    update_follows(request.user, follow=[author.pk])
     return redirect('profile', username=author)
 
 
 @login_required
 def profile_unfollow(request, username):
-    user = request.user
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=user, author=author).delete()
+    update_follows(request.user, unfollow=[author.pk])
     return redirect('profile', username=author)
 
 
@@ -63,12 +67,11 @@ def groups_index(request):
     return render(request, 'posts/groups.html', context)
 
 
+@page_cache('group:{slug}')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.post_set.all()
-    paginator = Paginator(post_list, PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = resolve_thumbnails(get_page(request, post_list))
     context = {
         'group': group,
         'page': page
@@ -76,31 +79,57 @@ def group_posts(request, slug):
     return render(request, 'posts/group.html', context)
 
 
+@page_cache('profile:{username}')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     following = request.user.is_authenticated and (
         Follow.objects.filter(user=request.user, author=author).exists()
     )
     post_list = (
         Post.objects.select_related('author', 'group').filter(author=author)
     )
-    paginator = Paginator(post_list, PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = resolve_thumbnails(get_page(request, post_list))
     context = {
         'author': author,
+        'stats': get_author_stats(author),
         'page': page,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@page_cache('profile:{username}')
+def follows(request, username, kind):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    form = UsernamePrefixForm(request.GET)
+    prefix = form.cleaned_data['prefix'] if form.is_valid() else ''
+    page = get_cursor_page(
+        request, follow_list(author, kind, prefix), keys=('id',)
+    )
+    with_person(page, kind)
+    context = {
+        'author': author,
+        'stats': get_author_stats(author),
+        'kind': kind,
+        'form': form,
+        'page': page,
+        'page_query': urlencode({'prefix': prefix}) + '&' if prefix else '',
+    }
+    return render(request, 'posts/follows.html', context)
+
+
+@page_cache('profile:{username}', 'post:{post_id}')
 def post_view(request, username, post_id):
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'),
+        Post.objects.select_related('author__stats', 'group'),
         pk=post_id,
         author__username=username
     )
+    resolve_thumbnails([post])
     author = post.author
     comments = post.comments.all()
     following = request.user.is_authenticated and (
@@ -109,6 +138,7 @@ def post_view(request, username, post_id):
     form = CommentForm()
     context = {
         'author': author,
+        'stats': get_author_stats(author),
         'post': post,
         'following': following,
         'comments': comments,
@@ -125,31 +155,32 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
         return redirect('post', username=username, post_id=post_id)
 
     return redirect('post', username=username, post_id=post_id)
 
 
 def search_user(request):
-    if request.method == 'POST':
-        form = SearchUserForm(request.POST)
-        if form.is_valid():
-            search = form.data['search']
-            find_username = User.objects.filter(username__icontains=search)
-            find_first_name = User.objects.filter(first_name__icontains=search)
-            find_last_name = User.objects.filter(last_name__icontains=search)
-            find_user = find_username.union(find_first_name, find_last_name)
-            find_post = Post.objects.filter(text__icontains=search)
-            context = {
-                'form': form,
-                'find_user': find_user,
-                'find_post': find_post,
-            }
-            return render(request, 'posts/search.html', context)
-        return render(request, 'posts/search.html', {'form': form})
-    form = SearchUserForm()
-    return render(request, 'posts/search.html', {'form': form})
+    form = SearchUserForm(request.GET or None)
+    context = {'form': form}
+    if form.is_valid():
+        search = form.cleaned_data['search']
+        post_ids = cached_search(
+            'post', search, settings.SEARCH_RESULTS_LIMIT
+        )
+        user_ids = cached_search('user', search, settings.SEARCH_USERS_LIMIT)
+        paginator = Paginator(post_ids, PAGE_SIZE)
+        page = paginator.get_page(request.GET.get('page'))
+        page.object_list = posts_by_ids(page.object_list)
+        context.update({
+            'search': search,
+            'find_user': users_by_ids(user_ids),
+            'page': page,
+            'page_query': urlencode({'search': search}) + '&',
+        })
+    return render(request, 'posts/search.html', context)
 
 
 @login_required
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.utils.module_loading import import_string
+
+User = get_user_model()
+
+USER_COUNT_KEY = 'users:count'
+
+
+def exact_count():
+    return User.objects.count()
+
+
+def postgres_estimate():
+    """
+    Оценка числа пользователей из pg_class.reltuples, которую PostgreSQL
+    обновляет при VACUUM/ANALYZE. Саму таблицу пользователей не читает.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [User._meta.db_table]
+        )
+        row = cursor.fetchone()
+    # reltuples < 0, пока таблица ни разу не анализировалась
+    if row is None or row[0] < 0:
+        return exact_count()
+    return row[0]
+
+
+def get_user_count():
+    """
+    Количество пользователей из кэша. Значение пересчитывается не реже,
+    чем раз в USER_COUNT_TIMEOUT секунд, между пересчётами его сдвигают
+    сигналы создания и удаления пользователей.
+    """
+    count = cache.get(USER_COUNT_KEY)
+    if count is None:
+        count = import_string(settings.USER_COUNT_BACKEND)()
+        cache.set(USER_COUNT_KEY, count, settings.USER_COUNT_TIMEOUT)
+    return count
+
+
+def change_user_count(delta):
+    try:
+        cache.incr(USER_COUNT_KEY, delta)
+    except ValueError:
+        # счётчика нет в кэше, он будет посчитан при следующем чтении
+        pass
@@ -0,0 +1,66 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Post
+from users.counters import get_user_count, postgres_estimate
+
+User = get_user_model()
+
+
+class UserCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_count_shifted_by_user_signals(self):
+        """Проверяет, что создание и удаление пользователя сдвигают
+        счётчик в кэше без пересчёта таблицы."""
+        self.assertEqual(get_user_count(), 2)
+        user = User.objects.create_user(username='new_user')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_count(), 3)
+        user.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_count(), 2)
+
+    def test_missing_counter_recounted(self):
+        """Проверяет, что без счётчика в кэше сигнал ничего не ломает,
+        а значение пересчитывается при следующем чтении."""
+        User.objects.create_user(username='new_user')
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_count(), 3)
+
+    def test_follows_and_posts_keep_count(self):
+        """Проверяет, что подписка, отписка, создание и удаление поста
+        не меняют счётчик пользователей."""
+        self.assertEqual(get_user_count(), 2)
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        follow.delete()
+        post = Post.objects.create(text='Пост', author=self.author)
+        post.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_count(), 2)
+
+    def test_context_processor_shows_count(self):
+        response = self.guest_client.get(reverse('about:author'))
+        self.assertEqual(response.context['user_count'], 2)
+        User.objects.create_user(username='new_user')
+        response = self.guest_client.get(reverse('about:author'))
+        self.assertEqual(response.context['user_count'], 3)
+
+    @skipUnless(connection.vendor == 'postgresql', 'нужен PostgreSQL')
+    def test_postgres_estimate_after_analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {User._meta.db_table}')
+        self.assertEqual(postgres_estimate(), User.objects.count())
@@ -1,8 +1,6 @@
 import datetime as dt
 
-from django.contrib.auth import get_user_model
-
-User = get_user_model()
+from users.counters import get_user_count
 
 
 def year(request):
@@ -13,11 +11,11 @@ def year(request):
         'year': dt.datetime.now().year
     }
 
+
 def count_user(request):
     """
         Добавляет переменную с кол-м зарег-х пользователей.
     """
-    user_count = User.objects.all().count()
     return {
-        'user_count': user_count
-    }
\ No newline at end of file
+        'user_count': get_user_count()
+    }
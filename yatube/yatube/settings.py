@@ -140,20 +140,110 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 # переменная для кол-ва постов на странице для пажинатора
 PAGE_SIZE = 10
-
-# для кэширования файлов
+# курсорная пагинация лент: ссылки ?before=/?after= вместо ?page=,
+# страницы выбираются без COUNT(*) и OFFSET
+CURSOR_PAGINATION = env.bool('CURSOR_PAGINATION', default=False)
+# лента подписок: посты авторов, у которых подписчиков больше лимита,
+# не раскладываются по лентам, а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+# сколько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL_SIZE = 500
+
+# счётчик пользователей в подвале: сколько секунд значение из кэша
+# может отставать и чем его пересчитывать
+USER_COUNT_TIMEOUT = 60 * 15
+USER_COUNT_BACKEND = (
+    'users.counters.postgres_estimate'
+    if 'postgresql' in DATABASES['default']['ENGINE']
+    else 'users.counters.exact_count'
+)
+
+# поиск: на PostgreSQL — полнотекстовый с GIN-индексами,
+# на остальных базах — встроенный инвертированный индекс
+SEARCH_BACKEND = (
+    'posts.search.PostgresSearchBackend'
+    if 'postgresql' in DATABASES['default']['ENGINE']
+    else 'posts.search.InvertedIndexBackend'
+)
+# сколько постов поиск отдаёт всего (по PAGE_SIZE на страницу)
+# и сколько пользователей показывает над ними
+SEARCH_RESULTS_LIMIT = 100
+SEARCH_USERS_LIMIT = 5
+# сколько секунд кэшируются результаты одного запроса
+SEARCH_CACHE_TIMEOUT = 60
+
+# кэш должен быть общим для всех процессов сервера: фрагменты и страницы
+# сбрасываются по событиям (счётчики поколений, отметки областей), и
+# событие, обработанное одним процессом, должны увидеть остальные. Адрес
+# задаётся в CACHE_URL, например memcache://127.0.0.1:11211; по умолчанию
+# LocMemCache, который виден только своему процессу
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
 }
+SHARED_CACHE = CACHES['default']['BACKEND'] != (
+    'django.core.cache.backends.locmem.LocMemCache'
+)
+# фрагменты ленты сбрасываются по событиям, а не по времени, поэтому
+# в общем кэше хранятся долго; в кэше процесса чужие сбросы не видны,
+# и срок жизни — единственное, что ограничивает устаревание
+FEED_CACHE_TIMEOUT = 60 * 60 * 6 if SHARED_CACHE else 60
+# страницы для анонимных посетителей кэшируются целиком
+# и тоже сбрасываются по событиям
+PAGE_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else 60
+# отметки изменения областей кэша: области берутся из адресов запросов,
+# поэтому отметки не вечные
+SCOPE_STAMP_TIMEOUT = PAGE_CACHE_TIMEOUT
+# сколько секунд прокси и клиенты могут не перепроверять ответы API
+API_CACHE_MAX_AGE = 60
+# сколько объектов можно создать одним запросом к .../_bulk/
+API_BULK_LIMIT = 100
+# сколько подзапросов можно передать в /api/v1/batch/ и в скольких
+# потоках выполнять пакет только из чтения
+API_BATCH_LIMIT = 20
+API_BATCH_WORKERS = 4
+# сколько секунд пользователь, найденный по JWT, живёт в кэше: после
+# изменения пользователя другие процессы с LocMemCache видят старую
+# запись до конца этого срока
+JWT_USER_CACHE_TIMEOUT = 60
+
+# миниатюры картинок постов создаются заранее в пуле потоков;
+# 0 — создавать сразу после коммита в том же потоке
+THUMBNAIL_WORKERS = 2
+# сколько секунд картинка считается занятой генерацией; с LocMemCache
+# блокировка действует только в своём процессе
+THUMBNAIL_LOCK_TIMEOUT = 60
+# через сколько секунд повторить создание миниатюр после ошибки
+THUMBNAIL_RETRY_TIMEOUT = 60 * 60 * 24
+# варианты картинки поста для srcset: ширины и форматы в порядке
+# предпочтения браузером
+IMAGE_VARIANT_WIDTHS = (480, 720, 960)
+IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+
+# загрузки пишутся во временный файл и обрезаются на UPLOAD_MAX_SIZE байт
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedUploadHandler']
+UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+# картинки больше стольких пикселей отклоняются по заголовку
+IMAGE_UPLOAD_MAX_PIXELS = 50_000_000
+# большая сторона хранимого оригинала
+IMAGE_MAX_SIDE = 2560
 
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'api.renderers.MessagePackParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,